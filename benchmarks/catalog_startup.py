@@ -0,0 +1,80 @@
+"""
+Measure per-worker startup cost of the reference catalogs.
+
+    python benchmarks/catalog_startup.py --workers 8
+
+Each worker loads everything a fleet worker touches (instance sizing, AMI
+lookup, resource spec, knowledge base, template) and reports its startup time
+and resident/shared/private memory. Private memory is what each extra worker
+adds. Run once with the compiled catalog and once with --source to compare
+against parsing the source files in every worker.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import catalog  # noqa: E402
+
+
+def _memory_kib():
+    try:
+        with open("/proc/self/statm", "r", encoding="utf-8") as f:
+            _, resident, shared = (int(v) for v in f.read().split()[:3])
+    except OSError:
+        return None, None, None
+    page_kib = os.sysconf("SC_PAGE_SIZE") // 1024
+    private = None
+    try:
+        with open("/proc/self/smaps_rollup", "r", encoding="utf-8") as f:
+            private = sum(int(line.split()[1]) for line in f if line.startswith(("Private_Clean", "Private_Dirty")))
+    except OSError:
+        pass
+    return resident * page_kib, shared * page_kib, private
+
+
+def _worker(_):
+    start = time.perf_counter()
+    reference = catalog.get_catalog()
+    reference.smallest_instance(4, 16)
+    reference.ami_path("ubuntu 22.04")
+    reference.resource_type("AWS::EC2::Instance")
+    knowledge = reference.knowledge_index()
+    knowledge.aliases("apache")
+    knowledge.nearest(("postgre", "sql"), 0.7)
+    reference.template_source("cloudformation_template.j2")
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    resident, shared, private = _memory_kib()
+    return {
+        "pid": os.getpid(),
+        "catalog": type(reference).__name__,
+        "startup_ms": round(elapsed_ms, 2),
+        "rss_kib": resident,
+        "shared_kib": shared,
+        "private_kib": private,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark catalog startup across worker processes")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes to start")
+    parser.add_argument("--source", action="store_true", help="Skip the compiled catalog and parse source files")
+    args = parser.parse_args()
+
+    if args.source:
+        os.environ["AUTOBLUEPRINT_CATALOG"] = os.path.join(os.devnull, "missing")
+    else:
+        # Explicit, so the benchmark never silently measures the source fallback.
+        catalog.ensure_compiled()
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for result in pool.map(_worker, range(args.workers)):
+            print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Compare classifier backend throughput on a synthetic host inventory.
+
+    python benchmarks/classifier_throughput.py --programs 5000 --backends local
+    python benchmarks/classifier_throughput.py --programs 200 --backends local openai
+
+Every timed pass uses a fresh backend instance, so per-name caches start cold
+and the numbers measure classification rather than cache hits. The remote
+backend only classifies a sample (CLASSIFY_MAX_SAMPLE), so its programs/sec is
+reported against the programs it actually sent.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import KNOWLEDGE_BASE_PATH  # noqa: E402
+from cleaner.backends import get_backend  # noqa: E402
+from program_index import ProgramIndex  # noqa: E402
+
+NOISE_NAMES = [
+    "Google Chrome", "Mozilla Firefox", "7-Zip", "Notepad++", "Adobe Acrobat Reader DC",
+    "Intel(R) Network Connections", "NVIDIA Graphics Driver", "VMware Tools", "CrowdStrike Windows Sensor",
+    "Microsoft Edge", "Microsoft Visual C++ 2019 X64 Minimum Runtime", "Microsoft Update Health Tools",
+    "Realtek Audio Driver", "PuTTY release", "WinSCP", "Git", "Splunk Universal Forwarder",
+]
+NOISE_SUFFIXES = ["", " Update Service", " Helper", " (x64)", " Language Pack", " Toolkit"]
+
+
+def synthetic_programs(count, seed=7):
+    rng = random.Random(seed)
+    with open(KNOWLEDGE_BASE_PATH, "r", encoding="utf-8") as f:
+        known = [entry["name"] for entry in json.load(f)["programs"]]
+    programs = []
+    for _ in range(count):
+        version = f"{rng.randint(1, 20)}.{rng.randint(0, 9)}.{rng.randint(0, 99)}"
+        if rng.random() < 0.2:
+            name = f"{rng.choice(known)} {version}"
+        else:
+            name = rng.choice(NOISE_NAMES) + rng.choice(NOISE_SUFFIXES)
+        programs.append({"name": name, "version": version, "publisher": "Example Corp"})
+    return programs
+
+
+def _fresh_backend(backend_name):
+    # Bypass the shared instance so no per-name cache survives from an earlier pass.
+    return type(get_backend(backend_name))()
+
+
+def run(backend_name, programs, repeat):
+    timings = []
+    components = []
+    for _ in range(repeat):
+        backend = _fresh_backend(backend_name)
+        # A fresh index too, so the memoized lookups start empty as well.
+        program_index = ProgramIndex(programs)
+        start = time.perf_counter()
+        components = backend.classify(programs, program_index=program_index)
+        timings.append(time.perf_counter() - start)
+    sent = len(programs)
+    if backend_name == "openai":
+        sent = min(sent, int(os.getenv("CLASSIFY_MAX_SAMPLE", "35")))
+    best = min(timings)
+    return {
+        "backend": backend_name,
+        "programs": sent,
+        "components": len(components),
+        "best_seconds": round(best, 4),
+        "programs_per_second": round(sent / best, 1) if best else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark classifier backend throughput")
+    parser.add_argument("--programs", type=int, default=5000, help="Synthetic programs per host")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed repetitions per backend")
+    parser.add_argument("--backends", nargs="+", default=["local"], help="Backends to benchmark")
+    args = parser.parse_args()
+
+    programs = synthetic_programs(args.programs)
+    for name in args.backends:
+        repeat = 1 if name == "openai" else args.repeat
+        print(json.dumps(run(name, programs, repeat)))
+
+
+if __name__ == "__main__":
+    main()
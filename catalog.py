@@ -0,0 +1,369 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime, timezone
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CATALOG_PATH = os.path.join(ROOT_DIR, "catalog.sqlite")
+KNOWLEDGE_BASE_PATH = os.path.join(ROOT_DIR, "cleaner", "knowledge_base.json")
+RESOURCE_SPEC_PATH = os.path.join(ROOT_DIR, "generator", "resource_spec.json")
+TEMPLATES_DIR = os.path.join(ROOT_DIR, "templates")
+# Pages are served from the OS page cache through mmap, so every worker shares one copy.
+MMAP_SIZE = 256 * 1024 * 1024
+# generator/cloudformation.py holds INSTANCE_CATALOG and SSM_AMI_PATHS.
+CLOUDFORMATION_MODULE_PATH = os.path.join(ROOT_DIR, "generator", "cloudformation.py")
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID;
+CREATE TABLE instance_types (
+    name TEXT PRIMARY KEY,
+    vcpus INTEGER NOT NULL,
+    memory_gib REAL NOT NULL,
+    position INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX instance_types_size ON instance_types (vcpus, memory_gib, position);
+CREATE TABLE ami_paths (os_key TEXT PRIMARY KEY, ssm_path TEXT NOT NULL) WITHOUT ROWID;
+CREATE TABLE resource_types (type TEXT PRIMARY KEY, spec TEXT NOT NULL) WITHOUT ROWID;
+CREATE TABLE documents (name TEXT PRIMARY KEY, body TEXT NOT NULL) WITHOUT ROWID;
+CREATE TABLE templates (name TEXT PRIMARY KEY, source TEXT NOT NULL) WITHOUT ROWID;
+CREATE TABLE kb_programs (id INTEGER PRIMARY KEY, name TEXT NOT NULL, type TEXT NOT NULL);
+CREATE TABLE kb_aliases (
+    id INTEGER PRIMARY KEY,
+    head TEXT NOT NULL,
+    phrase TEXT NOT NULL,
+    length INTEGER NOT NULL,
+    program_id INTEGER NOT NULL
+);
+CREATE INDEX kb_aliases_head ON kb_aliases (head, length DESC, id);
+CREATE TABLE kb_keys (key TEXT PRIMARY KEY, gram_count INTEGER NOT NULL, program_id INTEGER NOT NULL) WITHOUT ROWID;
+CREATE TABLE kb_key_grams (gram TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (gram, key)) WITHOUT ROWID;
+CREATE TABLE kb_excludes (phrase TEXT PRIMARY KEY) WITHOUT ROWID;
+"""
+
+
+def _read_text(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _load_sources():
+    """
+    Collect every reference dataset from its source of truth in the tree.
+    """
+    from generator.cloudformation import INSTANCE_CATALOG, SSM_AMI_PATHS
+
+    templates = {}
+    for name in sorted(os.listdir(TEMPLATES_DIR)):
+        if name.endswith(".j2"):
+            templates[name] = _read_text(os.path.join(TEMPLATES_DIR, name))
+    return {
+        "instance_types": INSTANCE_CATALOG,
+        "ami_paths": SSM_AMI_PATHS,
+        "knowledge_base": _read_text(KNOWLEDGE_BASE_PATH),
+        "resource_spec": _read_text(RESOURCE_SPEC_PATH),
+        "templates": templates,
+    }
+
+
+def _source_files():
+    templates = [os.path.join(TEMPLATES_DIR, n) for n in sorted(os.listdir(TEMPLATES_DIR)) if n.endswith(".j2")]
+    return [CLOUDFORMATION_MODULE_PATH, KNOWLEDGE_BASE_PATH, RESOURCE_SPEC_PATH, *templates]
+
+
+def source_manifest():
+    """
+    Cheap fingerprint of the source files (path, mtime, size) used to spot a stale catalog on open.
+    """
+    entries = []
+    for path in _source_files():
+        try:
+            stat = os.stat(path)
+        except OSError:
+            entries.append([os.path.relpath(path, ROOT_DIR), None, None])
+            continue
+        entries.append([os.path.relpath(path, ROOT_DIR), stat.st_mtime_ns, stat.st_size])
+    return json.dumps(entries)
+
+
+def sources_hash(sources=None):
+    sources = sources or _load_sources()
+    return hashlib.sha256(json.dumps(sources, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def compile_catalog(path=DEFAULT_CATALOG_PATH):
+    """
+    Compile the reference datasets into a read-only SQLite file, replacing ``path`` atomically.
+    """
+    from cleaner.knowledge_index import knowledge_rows
+
+    # Taken before reading, so an edit made mid-compile still marks the result stale.
+    manifest = source_manifest()
+    sources = _load_sources()
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.executescript(SCHEMA)
+        conn.executemany(
+            "INSERT INTO instance_types (name, vcpus, memory_gib, position) VALUES (?, ?, ?, ?)",
+            [(i["name"], i["vcpus"], i["memory_gib"], pos) for pos, i in enumerate(sources["instance_types"])],
+        )
+        conn.executemany("INSERT INTO ami_paths (os_key, ssm_path) VALUES (?, ?)", sources["ami_paths"].items())
+        resource_spec = json.loads(sources["resource_spec"])
+        conn.executemany(
+            "INSERT INTO resource_types (type, spec) VALUES (?, ?)",
+            [(name, json.dumps(spec)) for name, spec in resource_spec["ResourceTypes"].items()],
+        )
+        conn.executemany(
+            "INSERT INTO documents (name, body) VALUES (?, ?)",
+            [
+                ("knowledge_base", sources["knowledge_base"]),
+                ("resource_spec_version", json.dumps(resource_spec.get("spec_version", "unknown"))),
+            ],
+        )
+        conn.executemany("INSERT INTO templates (name, source) VALUES (?, ?)", sources["templates"].items())
+        for table, rows in knowledge_rows(json.loads(sources["knowledge_base"])).items():
+            if rows:
+                placeholders = ", ".join("?" * len(rows[0]))
+                conn.executemany(f"INSERT INTO {table} VALUES ({placeholders})", rows)
+        conn.executemany(
+            "INSERT INTO meta (key, value) VALUES (?, ?)",
+            [
+                ("sources_hash", sources_hash(sources)),
+                ("sources_manifest", manifest),
+                ("built_at", datetime.now(timezone.utc).isoformat()),
+            ],
+        )
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    return path
+
+
+class Catalog:
+    """
+    Read-only view of the compiled reference data.
+
+    The file is opened immutable with mmap enabled, so worker processes share
+    the kernel's page cache instead of each parsing and holding their own copy.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._resource_types = {}
+        self._knowledge_index = None
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro&immutable=1", uri=True)
+            conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+            self._local.conn = conn
+        return conn
+
+    def query(self, sql, params=()):
+        return self._conn().execute(sql, params).fetchall()
+
+    def meta(self, key):
+        row = self._conn().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def instance_types(self):
+        rows = self._conn().execute(
+            "SELECT name, vcpus, memory_gib FROM instance_types ORDER BY vcpus, memory_gib, position"
+        )
+        return [{"name": name, "vcpus": vcpus, "memory_gib": memory_gib} for name, vcpus, memory_gib in rows]
+
+    def smallest_instance(self, min_vcpus=None, min_memory_gib=None):
+        # Ties keep INSTANCE_CATALOG order, as the original stable sort did.
+        row = self._conn().execute(
+            "SELECT name FROM instance_types WHERE vcpus >= ? AND memory_gib >= ? "
+            "ORDER BY vcpus, memory_gib, position LIMIT 1",
+            (min_vcpus or 0, min_memory_gib or 0),
+        ).fetchone()
+        return row[0] if row else None
+
+    def ami_path(self, os_key):
+        row = self._conn().execute("SELECT ssm_path FROM ami_paths WHERE os_key = ?", (os_key,)).fetchone()
+        return row[0] if row else None
+
+    def resource_type(self, resource_type):
+        if resource_type not in self._resource_types:
+            row = self._conn().execute("SELECT spec FROM resource_types WHERE type = ?", (resource_type,)).fetchone()
+            self._resource_types[resource_type] = json.loads(row[0]) if row else None
+        return self._resource_types[resource_type]
+
+    def resource_spec_version(self):
+        return json.loads(self.document("resource_spec_version"))
+
+    def document(self, name):
+        row = self._conn().execute("SELECT body FROM documents WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def knowledge_base(self):
+        return json.loads(self.document("knowledge_base"))
+
+    def knowledge_index(self):
+        """
+        Knowledge base lookups served from the indexed kb_* tables rather than a parsed copy.
+        """
+        from cleaner.knowledge_index import SqliteKnowledgeIndex
+
+        if self._knowledge_index is None:
+            self._knowledge_index = SqliteKnowledgeIndex(self)
+        return self._knowledge_index
+
+    def template_source(self, name):
+        row = self._conn().execute("SELECT source FROM templates WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+
+class SourceCatalog:
+    """
+    Same interface as Catalog, served straight from the source files when nothing is compiled.
+    """
+
+    def __init__(self):
+        sources = _load_sources()
+        self.path = None
+        self._instance_types = sorted(sources["instance_types"], key=lambda i: (i["vcpus"], i["memory_gib"]))
+        self._ami_paths = dict(sources["ami_paths"])
+        self._resource_spec = json.loads(sources["resource_spec"])
+        self._knowledge_base = sources["knowledge_base"]
+        self._templates = sources["templates"]
+        self._hash = sources_hash(sources)
+        self._knowledge_index = None
+
+    def meta(self, key):
+        return self._hash if key == "sources_hash" else None
+
+    def instance_types(self):
+        return [dict(i) for i in self._instance_types]
+
+    def smallest_instance(self, min_vcpus=None, min_memory_gib=None):
+        for inst in self._instance_types:
+            if inst["vcpus"] >= (min_vcpus or 0) and inst["memory_gib"] >= (min_memory_gib or 0):
+                return inst["name"]
+        return None
+
+    def ami_path(self, os_key):
+        return self._ami_paths.get(os_key)
+
+    def resource_type(self, resource_type):
+        return self._resource_spec["ResourceTypes"].get(resource_type)
+
+    def resource_spec_version(self):
+        return self._resource_spec.get("spec_version", "unknown")
+
+    def knowledge_base(self):
+        return json.loads(self._knowledge_base)
+
+    def knowledge_index(self):
+        from cleaner.knowledge_index import MemoryKnowledgeIndex
+
+        if self._knowledge_index is None:
+            self._knowledge_index = MemoryKnowledgeIndex(self.knowledge_base())
+        return self._knowledge_index
+
+    def template_source(self, name):
+        return self._templates.get(name)
+
+
+_catalog = None
+_catalog_pid = None
+_catalog_lock = threading.Lock()
+
+
+def catalog_path():
+    return os.getenv("AUTOBLUEPRINT_CATALOG") or DEFAULT_CATALOG_PATH
+
+
+def is_fresh(compiled):
+    """
+    True when ``compiled`` was built from the source files as they are now (compared by mtime and size).
+    """
+    return compiled.meta("sources_manifest") == source_manifest()
+
+
+def _open_fresh(path):
+    """
+    Open the compiled catalog at ``path`` unless it is missing, unreadable or older than its sources.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        compiled = Catalog(path)
+        fresh = is_fresh(compiled)
+    except sqlite3.DatabaseError as exc:
+        logger.warning("Ignoring unreadable catalog %s: %s", path, exc)
+        return None
+    if not fresh:
+        logger.warning("Catalog %s is older than its sources; reading them directly (run: python catalog.py build)", path)
+        return None
+    return compiled
+
+
+def get_catalog():
+    """
+    Return this process's catalog: the compiled file when present and current, otherwise the source files.
+    """
+    global _catalog, _catalog_pid
+    with _catalog_lock:
+        # Connections must not cross a fork, so each process opens its own.
+        if _catalog is None or _catalog_pid != os.getpid():
+            _catalog = _open_fresh(catalog_path()) or SourceCatalog()
+            _catalog_pid = os.getpid()
+        return _catalog
+
+
+def ensure_compiled(path=None):
+    """
+    Compile the catalog if it is missing or stale; call once in the parent before fanning out workers.
+    """
+    global _catalog
+    path = path or catalog_path()
+    if os.path.exists(path):
+        try:
+            if is_fresh(Catalog(path)):
+                return path
+        except sqlite3.DatabaseError:
+            pass
+    compile_catalog(path)
+    with _catalog_lock:
+        _catalog = None
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile AutoBlueprint reference data into a shared read-only catalog")
+    parser.add_argument("command", choices=["build", "check"], help="build: (re)compile; check: report staleness")
+    parser.add_argument("--output", default=catalog_path(), help="Catalog file path")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        print(f"✅ Catalog compiled to {compile_catalog(args.output)}")
+        return
+    if not os.path.exists(args.output):
+        print(f"❌ No catalog at {args.output}; run: python catalog.py build")
+        sys.exit(1)
+    if not is_fresh(Catalog(args.output)):
+        print(f"⚠️ Catalog at {args.output} is stale; run: python catalog.py build")
+        sys.exit(1)
+    print(f"✅ Catalog at {args.output} is up to date.")
+
+
+if __name__ == "__main__":
+    main()
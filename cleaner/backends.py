@@ -0,0 +1,61 @@
+import importlib
+import os
+import threading
+
+# Backends are imported lazily so an offline run never needs the OpenAI client configured.
+BACKENDS = {
+    "openai": "cleaner.classify:OpenAIBackend",
+    "local": "cleaner.local_backend:LocalBackend",
+}
+DEFAULT_BACKEND = "openai"
+
+COMPONENT_TYPES = ("runtime", "middleware", "database", "app_server")
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+class ClassifierBackend:
+    """
+    Turns raw OSQuery program rows into classified software components.
+
+    Implementations return dicts with at least ``name``, ``version`` and ``type``
+    (one of COMPONENT_TYPES) and must be safe to call from several threads.
+    ``program_index`` is the host's prebuilt ProgramIndex, when the caller has one.
+    """
+
+    name = "base"
+    provider = None
+    model = None
+
+    def classify(self, raw_programs, program_index=None):
+        raise NotImplementedError
+
+
+def register_backend(name, target):
+    """
+    Register a backend under ``name``; ``target`` is a class or a "module:Class" string.
+    """
+    BACKENDS[name] = target
+    with _instances_lock:
+        _instances.pop(name, None)
+
+
+def get_backend(name=None):
+    """
+    Return the shared backend instance for ``name`` (default: CLASSIFIER_BACKEND env or openai).
+    """
+    if isinstance(name, ClassifierBackend):
+        return name
+    name = (name or os.getenv("CLASSIFIER_BACKEND") or DEFAULT_BACKEND).strip().lower()
+    target = BACKENDS.get(name)
+    if target is None:
+        raise ValueError(f"Unknown classifier backend: {name} (choose from {', '.join(sorted(BACKENDS))})")
+
+    with _instances_lock:
+        if name not in _instances:
+            if isinstance(target, str):
+                module_name, _, class_name = target.partition(":")
+                target = getattr(importlib.import_module(module_name), class_name)
+            _instances[name] = target()
+        return _instances[name]
@@ -1,54 +1,229 @@
 import os
+import csv
+import io
 import json
-import re
-from openai import OpenAI
+import logging
+import threading
+import time
+from openai import (
+    OpenAI,
+    APIConnectionError,
+    APITimeoutError,
+    BadRequestError,
+    InternalServerError,
+    RateLimitError,
+)
 from dotenv import load_dotenv
 
+from cleaner.backends import COMPONENT_TYPES, ClassifierBackend, get_backend
+
 load_dotenv()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+logger = logging.getLogger(__name__)
 
-def classify_programs(raw_programs):
-    # Prioritize non-Microsoft software to improve GPT relevance
-    model = os.getenv("GPT_MODEL", "gpt-4") 
-    MAX_SAMPLE = 35
+ENCODED_FIELDS = ("name", "version", "publisher")
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 1.0
+# Errors worth another attempt; anything else (bad request, auth) fails the same way every time.
+TRANSIENT_ERRORS = (APIConnectionError, APITimeoutError, RateLimitError, InternalServerError)
+
+RESPONSE_SCHEMA = {
+    "name": "classified_components",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "components": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "name": {"type": "string"},
+                        "version": {"type": ["string", "null"]},
+                        "publisher": {"type": ["string", "null"]},
+                        "type": {"type": "string", "enum": list(COMPONENT_TYPES)},
+                    },
+                    "required": ["name", "version", "publisher", "type"],
+                    "additionalProperties": False,
+                },
+            }
+        },
+        "required": ["components"],
+        "additionalProperties": False,
+    },
+}
+
+SYSTEM_PROMPT = (
+    "You are an AI assistant that classifies software discovered via OSQuery.\n"
+    "Programs are given as CSV with the columns: " + ",".join(ENCODED_FIELDS) + ".\n"
+    "Remove default system utilities, drivers, or irrelevant software.\n"
+    "Return only components that are application runtimes, middleware, databases, or app servers.\n"
+    "Tag each remaining entry with one of: 'runtime', 'middleware', 'database', 'app_server'.\n"
+    'Respond only with a JSON object of the form {"components": [{"name", "version", "publisher", "type"}]}.'
+)
+
+# Models that rejected json_schema response_format; they get the plain prompt from then on.
+_unstructured_models = set()
+
+
+class MalformedResponse(ValueError):
+    """Raised when a classification response does not match RESPONSE_SCHEMA."""
 
+
+def _select_sample(raw_programs, max_sample):
+    # Prioritize non-Microsoft software to improve GPT relevance
     interesting = [p for p in raw_programs if p.get("publisher") and "microsoft" not in p["publisher"].lower()]
-    sample = interesting[:MAX_SAMPLE] if len(interesting) >= MAX_SAMPLE else raw_programs[:MAX_SAMPLE]
+    return interesting[:max_sample] if len(interesting) >= max_sample else raw_programs[:max_sample]
 
 
-    system_prompt = (
-        "You are an AI assistant that classifies software discovered via OSQuery.\n"
-        "Remove default system utilities, drivers, or irrelevant software.\n"
-        "Return only components that are application runtimes, middleware, databases, or app servers.\n"
-        "Tag each remaining entry with one of: 'runtime', 'middleware', 'database', 'app_server'.\n"
-        "Respond only with a valid JSON array."
-    )
+def _encode_programs(programs):
+    """
+    Project programs onto the few fields the classifier needs and encode them as CSV.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(ENCODED_FIELDS)
+    for program in programs:
+        writer.writerow([(program.get(field) or "") for field in ENCODED_FIELDS])
+    return buffer.getvalue()
 
-    user_prompt = f"Here is a list of installed programs (JSON):\n\n{json.dumps(sample, indent=2)}"
 
-    try:
-        response = client.chat.completions.create(
-            model = model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.2
+def _validate_components(payload):
+    """
+    Check a decoded response against RESPONSE_SCHEMA and return its component list.
+    """
+    if isinstance(payload, dict):
+        payload = payload.get("components")
+    if not isinstance(payload, list):
+        raise MalformedResponse("response has no 'components' array")
+
+    components = []
+    for idx, item in enumerate(payload):
+        if not isinstance(item, dict):
+            raise MalformedResponse(f"component {idx} is not an object")
+        name = item.get("name")
+        if not isinstance(name, str) or not name.strip():
+            raise MalformedResponse(f"component {idx} has no name")
+        comp_type = item.get("type")
+        if comp_type not in COMPONENT_TYPES:
+            raise MalformedResponse(f"component {idx} has unknown type {comp_type!r}")
+        for key in ("version", "publisher"):
+            if item.get(key) is not None and not isinstance(item[key], str):
+                raise MalformedResponse(f"component {idx} has non-string {key}")
+        components.append(
+            {
+                "name": name.strip(),
+                "version": item.get("version") or None,
+                "publisher": item.get("publisher") or None,
+                "type": comp_type,
+            }
         )
+    return components
+
+
+def _decode_response(response_text):
+    """
+    Decode the first JSON value in a response, tolerating Markdown code fences around it.
+    """
+    text = (response_text or "").strip()
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        raise MalformedResponse("no JSON value in response")
+    try:
+        value, _ = json.JSONDecoder().raw_decode(text, min(starts))
+    except json.JSONDecodeError as exc:
+        raise MalformedResponse(f"invalid JSON: {exc}") from exc
+    return value
+
+
+class OpenAIBackend(ClassifierBackend):
+    """
+    Classify a prioritized sample of programs with a chat-completions model.
+    """
+
+    name = "openai"
+    provider = "openai"
+
+    def __init__(self, model=None):
+        self.model = model or os.getenv("GPT_MODEL", "gpt-4")
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        # Created on first request, so selecting the backend never needs an API key.
+        with self._client_lock:
+            if self._client is None:
+                self._client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+            return self._client
+
+    def _request_chunk(self, programs):
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": f"Installed programs (CSV):\n{_encode_programs(programs)}"},
+        ]
+        if self.model not in _unstructured_models:
+            try:
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0.2,
+                    response_format={"type": "json_schema", "json_schema": RESPONSE_SCHEMA},
+                )
+                return response.choices[0].message.content
+            except BadRequestError as e:
+                if "response_format" not in str(e):
+                    raise
+                logger.info("Model %s does not support structured output; using plain JSON prompt.", self.model)
+                _unstructured_models.add(self.model)
+
+        response = self.client.chat.completions.create(model=self.model, messages=messages, temperature=0.2)
+        return response.choices[0].message.content
+
+    def _classify_chunk(self, programs):
+        """
+        Classify one chunk, retrying only this chunk on a malformed response or a transient API error.
+        """
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            if attempt > 1:
+                time.sleep(RETRY_BACKOFF_SECONDS * 2 ** (attempt - 2))
+            try:
+                response_text = self._request_chunk(programs)
+            except TRANSIENT_ERRORS as e:
+                logger.warning("OpenAI request failed (attempt %d/%d): %s", attempt, MAX_ATTEMPTS, e)
+                continue
+            try:
+                return _validate_components(_decode_response(response_text))
+            except MalformedResponse as e:
+                snippet = (response_text or "")[:200]
+                logger.warning("Malformed GPT response (attempt %d/%d): %s: %r", attempt, MAX_ATTEMPTS, e, snippet)
+        return None
+
+    def classify(self, raw_programs, program_index=None):
+        max_sample = int(os.getenv("CLASSIFY_MAX_SAMPLE", "35"))
+        chunk_size = max(1, int(os.getenv("CLASSIFY_CHUNK_SIZE", "35")))
+
+        sample = _select_sample(raw_programs, max_sample)
+
+        components = []
+        for start in range(0, len(sample), chunk_size):
+            chunk = sample[start:start + chunk_size]
+            try:
+                result = self._classify_chunk(chunk)
+            except Exception as e:
+                logger.error("GPT classification failed for programs %d-%d: %s", start, start + len(chunk) - 1, e)
+                continue
+            if result is None:
+                logger.error(
+                    "Giving up on programs %d-%d after %d attempts.", start, start + len(chunk) - 1, MAX_ATTEMPTS
+                )
+                continue
+            components.extend(result)
+        return components
+
 
-        response_text = response.choices[0].message.content.strip()
-        print("🧠 Raw GPT response:\n", response_text)
-
-        # Extract the first JSON array from the GPT output
-        json_match = re.search(r"\[\s*{.*?}\s*\]", response_text, re.DOTALL)
-        if json_match:
-            json_data = json_match.group(0)
-            return json.loads(json_data)
-        else:
-            print("❌ No JSON array found in GPT response.")
-            return []
-
-    except Exception as e:
-        print(f"❌ GPT classification failed: {e}")
-        return []
+def classify_programs(raw_programs, backend=None, program_index=None):
+    """
+    Classify programs with the named backend (default: CLASSIFIER_BACKEND env or openai).
+    """
+    return get_backend(backend).classify(raw_programs, program_index=program_index)
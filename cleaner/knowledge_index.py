@@ -0,0 +1,126 @@
+from functools import lru_cache
+
+from cleaner.backends import COMPONENT_TYPES
+from program_index import ProgramIndex, strip_versions, tokenize, trigrams
+
+ALIAS_CACHE_SIZE = 4096
+
+
+def iter_aliases(knowledge_base):
+    """
+    Yield ``(entry, alias, phrase_tokens)`` for every name and alias in a knowledge base document.
+    """
+    for entry in knowledge_base.get("programs", []):
+        if entry.get("type") not in COMPONENT_TYPES:
+            raise ValueError(f"Knowledge base entry {entry.get('name')!r} has unknown type {entry.get('type')!r}")
+        for alias in [entry["name"], *entry.get("aliases", [])]:
+            phrase = tokenize(alias)
+            if phrase:
+                yield entry, alias, phrase
+
+
+def _exclude_phrases(knowledge_base):
+    return [phrase for phrase in map(tokenize, knowledge_base.get("exclude_terms", [])) if phrase]
+
+
+def knowledge_rows(knowledge_base):
+    """
+    Flatten a knowledge base document into the catalog's kb_* table rows.
+    """
+    programs, aliases, keys, grams = [], [], {}, []
+    for entry, alias, phrase in iter_aliases(knowledge_base):
+        if not programs or programs[-1][1] is not entry:
+            programs.append((len(programs), entry))
+        program_id = programs[-1][0]
+        aliases.append((len(aliases), phrase[0], " ".join(phrase), len(phrase), program_id))
+        key_tokens = strip_versions(tokenize(alias.strip().lower()))
+        key = " ".join(key_tokens)
+        # The first alias to produce a key owns it, as ProgramIndex.records(key)[0] does.
+        if key_tokens and key not in keys:
+            key_grams = trigrams(key_tokens)
+            keys[key] = (key, len(key_grams), program_id)
+            grams.extend((gram, key) for gram in key_grams)
+    return {
+        "kb_programs": [(pid, entry["name"], entry["type"]) for pid, entry in programs],
+        "kb_aliases": aliases,
+        "kb_keys": list(keys.values()),
+        "kb_key_grams": grams,
+        "kb_excludes": sorted({(" ".join(phrase),) for phrase in _exclude_phrases(knowledge_base)}),
+    }
+
+
+class MemoryKnowledgeIndex:
+    """
+    Knowledge base lookups over a parsed document held in this process.
+    """
+
+    def __init__(self, knowledge_base):
+        self._excludes = _exclude_phrases(knowledge_base)
+        self._aliases_by_head = {}
+        alias_records = []
+        for entry, alias, phrase in iter_aliases(knowledge_base):
+            self._aliases_by_head.setdefault(phrase[0], []).append((phrase, entry))
+            alias_records.append({"name": alias, "entry": entry})
+        # Longest alias first so "apache tomcat" wins over "apache".
+        for candidates in self._aliases_by_head.values():
+            candidates.sort(key=lambda item: len(item[0]), reverse=True)
+        self._alias_index = ProgramIndex(alias_records)
+
+    def aliases(self, head):
+        return self._aliases_by_head.get(head, ())
+
+    def excludes(self):
+        return self._excludes
+
+    def nearest(self, key_tokens, min_similarity):
+        nearest = self._alias_index.nearest(key_tokens, min_similarity)
+        if nearest is None:
+            return None
+        alias_key, score = nearest
+        return self._alias_index.records(alias_key)[0]["entry"], score
+
+
+class SqliteKnowledgeIndex:
+    """
+    Knowledge base lookups answered from the compiled catalog's indexed kb_* tables.
+
+    Nothing but the (small) exclusion list and recently used aliases is held per
+    process; the rows themselves stay in the shared, memory-mapped catalog file.
+    """
+
+    def __init__(self, catalog):
+        self._catalog = catalog
+        rows = catalog.query("SELECT phrase FROM kb_excludes")
+        self._excludes = [tuple(phrase.split(" ")) for phrase, in rows]
+        self.aliases = lru_cache(maxsize=ALIAS_CACHE_SIZE)(self._aliases)
+
+    def _aliases(self, head):
+        rows = self._catalog.query(
+            "SELECT a.phrase, p.name, p.type FROM kb_aliases a JOIN kb_programs p ON p.id = a.program_id "
+            "WHERE a.head = ? ORDER BY a.length DESC, a.id",
+            (head,),
+        )
+        return tuple((tuple(phrase.split(" ")), {"name": name, "type": type_}) for phrase, name, type_ in rows)
+
+    def excludes(self):
+        return self._excludes
+
+    def nearest(self, key_tokens, min_similarity):
+        grams = trigrams(key_tokens)
+        if not grams:
+            return None
+        placeholders = ",".join("?" * len(grams))
+        rows = self._catalog.query(
+            "SELECT k.key, k.gram_count, COUNT(*), p.name, p.type FROM kb_key_grams g "
+            "JOIN kb_keys k ON k.key = g.key JOIN kb_programs p ON p.id = k.program_id "
+            f"WHERE g.gram IN ({placeholders}) GROUP BY k.key",
+            tuple(grams),
+        )
+        best, best_score = None, 0.0
+        for _key, gram_count, shared, name, type_ in rows:
+            score = shared / (len(grams) + gram_count - shared)
+            if score > best_score:
+                best, best_score = {"name": name, "type": type_}, score
+        if best is not None and best_score >= min_similarity:
+            return best, best_score
+        return None
@@ -0,0 +1,107 @@
+import json
+import os
+from functools import lru_cache
+
+from catalog import KNOWLEDGE_BASE_PATH, get_catalog
+from cleaner.backends import ClassifierBackend
+from cleaner.knowledge_index import MemoryKnowledgeIndex
+from program_index import index_programs, program_name, strip_versions, tokenize
+
+MIN_TRIGRAM_SIMILARITY = 0.7
+MATCH_CACHE_SIZE = 65536
+
+
+def _find_span(tokens, phrase):
+    """
+    Return (start, end) of the first contiguous occurrence of ``phrase`` in ``tokens``.
+    """
+    width = len(phrase)
+    for start in range(len(tokens) - width + 1):
+        if tokens[start:start + width] == phrase:
+            return start, start + width
+    return None
+
+
+class LocalBackend(ClassifierBackend):
+    """
+    Offline nearest-neighbour classifier over the bundled program knowledge base.
+
+    Every program is classified (not just a sample), and results are cached per
+    normalized name, so batches of thousands of programs cost one pass over
+    their distinct names.
+    """
+
+    name = "local"
+    provider = "local"
+
+    def __init__(self, knowledge_base_path=None):
+        path = knowledge_base_path or os.getenv("CLASSIFIER_KNOWLEDGE_BASE")
+        if path:
+            with open(path, "r", encoding="utf-8") as f:
+                self._knowledge = MemoryKnowledgeIndex(json.load(f))
+        else:
+            # The compiled catalog answers from its shared mmap instead of a per-process copy.
+            self._knowledge = get_catalog().knowledge_index()
+        self.model = f"knowledge_base:{os.path.basename(path or KNOWLEDGE_BASE_PATH)}"
+
+        self._match = lru_cache(maxsize=MATCH_CACHE_SIZE)(self._match_tokens)
+
+    def _is_excluded(self, tokens, span=None):
+        if span:
+            tokens = tokens[:span[0]] + ("|",) + tokens[span[1]:]
+        return any(_find_span(tokens, phrase) for phrase in self._knowledge.excludes())
+
+    def _alias_match(self, tokens):
+        best = None
+        for start, token in enumerate(tokens):
+            for phrase, entry in self._knowledge.aliases(token):
+                if tokens[start:start + len(phrase)] == phrase:
+                    if best is None or len(phrase) > len(best[0]):
+                        best = (phrase, entry, (start, start + len(phrase)))
+                    break
+        return best
+
+    def _nearest_neighbour(self, tokens):
+        key_tokens = strip_versions(tokens)
+        if not key_tokens:
+            return None
+        return self._knowledge.nearest(key_tokens, MIN_TRIGRAM_SIMILARITY)
+
+    def _match_tokens(self, tokens):
+        alias = self._alias_match(tokens)
+        if alias:
+            phrase, entry, span = alias
+            if self._is_excluded(tokens, span):
+                return None
+            return entry, 1.0
+        if self._is_excluded(tokens):
+            return None
+        return self._nearest_neighbour(tokens)
+
+    def classify(self, raw_programs, program_index=None):
+        host_index = program_index or index_programs(raw_programs)
+        components = []
+        seen = set()
+        for records in host_index.names().values():
+            match = self._match(tokenize(program_name(records[0])))
+            if match is None:
+                continue
+            entry, score = match
+            for program in records:
+                version = program.get("version") or None
+                # Distinct products can share an entry (Corretto and Temurin are both OpenJDK).
+                key = (program_name(program).strip().lower(), version)
+                if key in seen:
+                    continue
+                seen.add(key)
+                components.append(
+                    {
+                        "name": program_name(program).strip(),
+                        "version": version,
+                        "publisher": program.get("publisher") or None,
+                        "type": entry["type"],
+                        "match": entry["name"],
+                        "score": round(score, 3),
+                    }
+                )
+        return components
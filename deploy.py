@@ -3,6 +3,8 @@ import boto3
 from datetime import datetime
 from pathlib import Path
 
+from generator.validate import validate_templates
+
 # Load env variables
 from dotenv import load_dotenv
 load_dotenv()
@@ -24,7 +26,20 @@ def get_latest_template_path():
             return candidate
     return None
 
+def validate_before_deploy(template_path):
+    result = validate_templates([str(template_path)])[str(template_path)]
+    for warning in result["warnings"]:
+        print(f"⚠️ {warning}")
+    if not result["valid"]:
+        print(f"❌ {template_path} failed offline validation; not deploying:")
+        for error in result["errors"]:
+            print(f"   - {error}")
+    return result["valid"]
+
 def deploy_cloudformation(template_path):
+    if not validate_before_deploy(template_path):
+        return
+
     with open(template_path, "r") as f:
         template_body = f.read()
 
@@ -1,5 +1,7 @@
-from jinja2 import Environment, FileSystemLoader
-import os
+from functools import lru_cache
+from jinja2 import Environment, FunctionLoader
+
+from catalog import get_catalog
 
 # Basic instance catalog for quick heuristic matching
 INSTANCE_CATALOG = [
@@ -14,7 +16,15 @@ INSTANCE_CATALOG = [
     {"name": "m5.4xlarge", "vcpus": 16, "memory_gib": 64},
 ]
 
-DEFAULT_AMI_SSM = "/aws/service/ami-amazon-linux-latest/amzn2-ami-hvm-x86_64-gp2"
+# Map OS names to SSM Parameter paths for AMI lookup
+SSM_AMI_PATHS = {
+    "amazon linux 2": "/aws/service/ami-amazon-linux-latest/amzn2-ami-hvm-x86_64-gp2",
+    "ubuntu 22.04": "/aws/service/canonical/ubuntu/server/22.04/stable/current/amd64/hvm/ebs-gp2/ami-id",
+    "ubuntu 20.04": "/aws/service/canonical/ubuntu/server/20.04/stable/current/amd64/hvm/ebs-gp2/ami-id",
+    "windows server 2019": "/aws/service/ami-windows-latest/Windows_Server-2019-English-Full-Base",
+}
+
+DEFAULT_AMI_SSM = SSM_AMI_PATHS["amazon linux 2"]
 
 
 def _normalize_specs(specs):
@@ -48,18 +58,8 @@ def recommend_instance_type(specs):
     if not target_vcpus and not mem_gib:
         return None
 
-    candidates = []
-    for inst in INSTANCE_CATALOG:
-        if target_vcpus and inst["vcpus"] < target_vcpus:
-            continue
-        if mem_gib and inst["memory_gib"] < mem_gib:
-            continue
-        candidates.append(inst)
-    if not candidates:
-        return None
     # Pick the one with the smallest resources that still meets requirements
-    candidates.sort(key=lambda i: (i["vcpus"], i["memory_gib"]))
-    return candidates[0]["name"]
+    return get_catalog().smallest_instance(target_vcpus, mem_gib)
 
 
 def recommend_ami_parameter(specs):
@@ -73,14 +73,15 @@ def recommend_ami_parameter(specs):
     os_name = (specs.get("os_name") or "").lower()
     platform = (specs.get("platform") or "").lower()
 
+    os_key = None
     if "windows" in os_name or platform == "windows":
-        return "/aws/service/ami-windows-latest/Windows_Server-2019-English-Full-Base"
-    if "ubuntu 22" in os_name or "ubuntu 22" in platform:
-        return "/aws/service/canonical/ubuntu/server/22.04/stable/current/amd64/hvm/ebs-gp2/ami-id"
-    if "ubuntu 20" in os_name or "ubuntu 20" in platform:
-        return "/aws/service/canonical/ubuntu/server/20.04/stable/current/amd64/hvm/ebs-gp2/ami-id"
+        os_key = "windows server 2019"
+    elif "ubuntu 22" in os_name or "ubuntu 22" in platform:
+        os_key = "ubuntu 22.04"
+    elif "ubuntu 20" in os_name or "ubuntu 20" in platform:
+        os_key = "ubuntu 20.04"
 
-    return DEFAULT_AMI_SSM
+    return (os_key and get_catalog().ami_path(os_key)) or DEFAULT_AMI_SSM
 
 
 def recommend_volume_size(specs):
@@ -109,9 +110,15 @@ def _prepare_components(components):
     return normalized
 
 
+@lru_cache(maxsize=None)
+def _get_template(name="cloudformation_template.j2"):
+    # Template sources come from the shared catalog; compile each once per process.
+    env = Environment(loader=FunctionLoader(lambda template_name: get_catalog().template_source(template_name)))
+    return env.get_template(name)
+
+
 def generate_cloudformation_template(components, specs=None):
-    env = Environment(loader=FileSystemLoader("templates"))
-    template = env.get_template("cloudformation_template.j2")
+    template = _get_template()
 
     components = _prepare_components(components)
     recommended_instance = recommend_instance_type(specs) if specs else None
@@ -143,10 +150,7 @@ def generate_cloudformation_from_workload(workload):
     ami_param_default = recommend_ami_parameter(specs)
     volume_size_default = recommend_volume_size(specs)
 
-    env = Environment(loader=FileSystemLoader("templates"))
-    template = env.get_template("cloudformation_template.j2")
-
-    return template.render(
+    return _get_template().render(
         components=_prepare_components(components),
         specs=specs,
         instance_type_default=instance_type_default,
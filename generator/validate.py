@@ -0,0 +1,414 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import yaml
+
+from catalog import RESOURCE_SPEC_PATH, get_catalog
+
+DEFAULT_CACHE_PATH = os.path.join("output", ".validation_cache.json")
+# Bump when a change to the checks below should invalidate cached results.
+VALIDATOR_VERSION = 3
+
+PSEUDO_PARAMETERS = {
+    "AWS::AccountId",
+    "AWS::NotificationARNs",
+    "AWS::NoValue",
+    "AWS::Partition",
+    "AWS::Region",
+    "AWS::StackId",
+    "AWS::StackName",
+    "AWS::URLSuffix",
+}
+PARAMETER_TYPES = {"String", "Number", "List<Number>", "CommaDelimitedList"}
+TOP_LEVEL_KEYS = {
+    "AWSTemplateFormatVersion",
+    "Description",
+    "Metadata",
+    "Parameters",
+    "Rules",
+    "Mappings",
+    "Conditions",
+    "Transform",
+    "Resources",
+    "Outputs",
+}
+RESOURCE_KEYS = {
+    "Type",
+    "Properties",
+    "DependsOn",
+    "Condition",
+    "Metadata",
+    "DeletionPolicy",
+    "UpdateReplacePolicy",
+    "CreationPolicy",
+    "UpdatePolicy",
+}
+
+_SUB_VAR_RE = re.compile(r"\$\{([^}]*)\}")
+
+
+class _CfnLoader(yaml.SafeLoader):
+    """SafeLoader that understands CloudFormation's short-form intrinsic tags."""
+
+
+def _intrinsic(name):
+    key = name if name in ("Ref", "Condition") else f"Fn::{name}"
+
+    def construct(loader, node):
+        if isinstance(node, yaml.ScalarNode):
+            value = loader.construct_scalar(node)
+            if name == "GetAtt":
+                value = value.split(".", 1)
+        elif isinstance(node, yaml.SequenceNode):
+            value = loader.construct_sequence(node, deep=True)
+        else:
+            value = loader.construct_mapping(node, deep=True)
+        return {key: value}
+
+    return construct
+
+
+for _tag in (
+    "Ref", "Base64", "Cidr", "FindInMap", "GetAtt", "GetAZs", "ImportValue", "Join", "Select", "Split",
+    "Sub", "Transform", "And", "Equals", "If", "Not", "Or", "Condition", "ToJsonString", "Length",
+):
+    _CfnLoader.add_constructor(f"!{_tag}", _intrinsic(_tag))
+
+
+def load_template(text):
+    """
+    Parse CloudFormation YAML (or JSON) text, expanding short-form tags like !Ref into long form.
+    """
+    return yaml.load(text, Loader=_CfnLoader)
+
+
+def _is_intrinsic(value):
+    return isinstance(value, dict) and len(value) == 1 and (
+        "Ref" in value or next(iter(value)).startswith("Fn::") or "Condition" in value
+    )
+
+
+def _walk(node, path):
+    yield node, path
+    if isinstance(node, dict):
+        for key, value in node.items():
+            yield from _walk(value, f"{path}.{key}")
+    elif isinstance(node, list):
+        for idx, value in enumerate(node):
+            yield from _walk(value, f"{path}[{idx}]")
+
+
+def _check_type(expected, value):
+    """
+    Return True when ``value`` can satisfy a spec property type; intrinsics are resolved at deploy time.
+    """
+    if _is_intrinsic(value):
+        return True
+    if expected == "String":
+        return isinstance(value, (str, int, float)) and not isinstance(value, bool)
+    if expected in ("Integer", "Long"):
+        if isinstance(value, bool):
+            return False
+        return isinstance(value, int) or (isinstance(value, str) and value.strip().lstrip("-").isdigit())
+    if expected == "Double":
+        try:
+            float(value)
+            return not isinstance(value, bool)
+        except (TypeError, ValueError):
+            return False
+    if expected == "Boolean":
+        return isinstance(value, bool) or (isinstance(value, str) and value.lower() in ("true", "false"))
+    if expected == "List":
+        return isinstance(value, list)
+    if expected in ("Map", "Json"):
+        return isinstance(value, dict) or (expected == "Json" and isinstance(value, str))
+    return True
+
+
+def _check_parameters(parameters, errors):
+    for name, param in parameters.items():
+        where = f"Parameters.{name}"
+        if not isinstance(param, dict) or "Type" not in param:
+            errors.append(f"{where}: missing Type")
+            continue
+        param_type = param["Type"]
+        if not isinstance(param_type, str):
+            errors.append(f"{where}: Type must be a string, got {type(param_type).__name__}")
+            continue
+        if param_type not in PARAMETER_TYPES and not str(param_type).startswith(("AWS::", "List<AWS::")):
+            errors.append(f"{where}: unsupported parameter Type {param_type!r}")
+        allowed = param.get("AllowedValues")
+        if allowed is not None and not isinstance(allowed, list):
+            errors.append(f"{where}: AllowedValues must be a list")
+            allowed = None
+        if "Default" not in param:
+            continue
+        default = param["Default"]
+        if allowed is not None and str(default) not in {str(v) for v in allowed}:
+            errors.append(f"{where}: Default {default!r} is not in AllowedValues {allowed}")
+        if param_type == "Number" and not _check_type("Double", default):
+            errors.append(f"{where}: Default {default!r} is not a Number")
+
+
+def _check_references(template, parameters, resources, conditions, errors, warnings):
+    refable = set(parameters) | set(resources) | PSEUDO_PARAMETERS
+    for node, path in _walk(template.get("Conditions", {}), "Conditions"):
+        if isinstance(node, dict) and set(node) == {"Ref"} and node["Ref"] not in set(parameters) | PSEUDO_PARAMETERS:
+            errors.append(f"{path}: conditions may only Ref parameters, got {node['Ref']!r}")
+    # Outputs reference resources through the same intrinsics, so they get the same checks.
+    for section in ("Resources", "Outputs"):
+        for node, path in _walk(template.get(section) or {}, section):
+            if not isinstance(node, dict) or len(node) != 1:
+                continue
+            (key, value), = node.items()
+            if key == "Ref":
+                if not isinstance(value, str) or value not in refable:
+                    errors.append(f"{path}: Ref to undefined parameter or resource {value!r}")
+            elif key == "Fn::GetAtt":
+                _check_getatt(value, resources, path, errors, warnings)
+            elif key == "Fn::Sub":
+                _check_sub(value, refable, resources, path, errors)
+            elif key == "Fn::If":
+                if not isinstance(value, list) or len(value) != 3:
+                    errors.append(f"{path}: Fn::If takes [condition, value_if_true, value_if_false]")
+                elif value[0] not in conditions:
+                    errors.append(f"{path}: Fn::If references undefined condition {value[0]!r}")
+
+
+def _check_getatt(value, resources, path, errors, warnings):
+    if not (isinstance(value, list) and len(value) == 2):
+        errors.append(f"{path}: Fn::GetAtt takes [resource, attribute]")
+        return
+    resource_name, attribute = value
+    if resource_name not in resources:
+        errors.append(f"{path}: Fn::GetAtt references undefined resource {resource_name!r}")
+        return
+    resource = resources[resource_name]
+    if not isinstance(resource, dict):
+        # Already reported by _check_resources.
+        return
+    spec = get_catalog().resource_type(resource.get("Type"))
+    if spec is not None and isinstance(attribute, str) and attribute not in spec.get("Attributes", []):
+        # The bundled spec is a subset, so an attribute it lacks may still exist.
+        warnings.append(f"{path}: attribute {attribute!r} of {resource.get('Type')} is not in the bundled resource spec")
+
+
+def _check_sub(value, refable, resources, path, errors):
+    variables = {}
+    if isinstance(value, list):
+        if len(value) != 2 or not isinstance(value[1], dict):
+            errors.append(f"{path}: Fn::Sub list form takes [string, {{variables}}]")
+            return
+        value, variables = value
+    if not isinstance(value, str):
+        return
+    reported = set()
+    for match in _SUB_VAR_RE.finditer(value):
+        name = match.group(1)
+        if name.startswith("!") or name in variables or name in reported:
+            continue
+        reported.add(name)
+        if "." in name and not name.startswith("AWS::"):
+            resource_name = name.split(".", 1)[0]
+            if resource_name not in resources:
+                errors.append(f"{path}: Fn::Sub references undefined resource {resource_name!r} in ${{{name}}}")
+            continue
+        if name not in refable:
+            errors.append(
+                f"{path}: Fn::Sub references undefined variable ${{{name}}} (escape literals as ${{!{name}}})"
+            )
+
+
+def _check_resources(resources, conditions, errors, warnings):
+    catalog = get_catalog()
+    for name, resource in resources.items():
+        where = f"Resources.{name}"
+        if not isinstance(name, str) or not re.fullmatch(r"[A-Za-z0-9]+", name):
+            errors.append(f"{where}: logical ID must be alphanumeric")
+        if not isinstance(resource, dict) or "Type" not in resource:
+            errors.append(f"{where}: missing Type")
+            continue
+        for key in resource:
+            if key not in RESOURCE_KEYS:
+                errors.append(f"{where}: unknown resource attribute {key!r}")
+
+        condition = resource.get("Condition")
+        if condition is not None and condition not in conditions:
+            errors.append(f"{where}: Condition {condition!r} is not defined")
+        depends_on = resource.get("DependsOn") or []
+        for target in [depends_on] if isinstance(depends_on, str) else depends_on:
+            if target not in resources:
+                errors.append(f"{where}: DependsOn undefined resource {target!r}")
+
+        resource_type = resource["Type"]
+        spec = catalog.resource_type(resource_type)
+        if spec is None:
+            if not str(resource_type).startswith("Custom::"):
+                warnings.append(f"{where}: {resource_type} is not in the bundled resource spec; properties not checked")
+            continue
+
+        properties = resource.get("Properties") or {}
+        if not isinstance(properties, dict):
+            errors.append(f"{where}.Properties: must be a mapping")
+            continue
+        prop_specs = spec.get("Properties", {})
+        for prop_name, prop_spec in prop_specs.items():
+            if prop_spec.get("Required") and prop_name not in properties:
+                errors.append(f"{where}: missing required property {prop_name}")
+        for prop_name, value in properties.items():
+            prop_spec = prop_specs.get(prop_name)
+            if prop_spec is None:
+                # The bundled spec is a subset, so a property it lacks may still be valid.
+                warnings.append(f"{where}: property {prop_name!r} of {resource_type} is not in the bundled resource spec")
+                continue
+            if not _check_type(prop_spec["Type"], value):
+                errors.append(f"{where}.Properties.{prop_name}: expected {prop_spec['Type']}, got {type(value).__name__}")
+            allowed = prop_spec.get("AllowedValues")
+            if allowed and isinstance(value, str) and value not in allowed:
+                errors.append(f"{where}.Properties.{prop_name}: {value!r} is not one of {allowed}")
+
+
+def validate_template_text(text):
+    """
+    Validate rendered CloudFormation text offline; return {"valid", "errors", "warnings"}.
+    """
+    errors = []
+    warnings = []
+    try:
+        template = load_template(text)
+    except yaml.YAMLError as exc:
+        return {"valid": False, "errors": [f"YAML parse error: {exc}"], "warnings": []}
+    if not isinstance(template, dict):
+        return {"valid": False, "errors": ["Template must be a mapping"], "warnings": []}
+
+    try:
+        _check_template(template, errors, warnings)
+    except Exception as exc:
+        # Report rather than raise, so one odd template cannot fail a whole process pool wave.
+        errors.append(f"Validator error: {type(exc).__name__}: {exc}")
+    return {"valid": not errors, "errors": errors, "warnings": warnings}
+
+
+def _check_template(template, errors, warnings):
+    for key in template:
+        if key not in TOP_LEVEL_KEYS:
+            errors.append(f"Unknown top-level section {key!r}")
+    sections = {}
+    for key in ("Parameters", "Resources", "Conditions", "Outputs"):
+        section = template.get(key) or {}
+        if not isinstance(section, dict):
+            errors.append(f"{key} section must be a mapping, got {type(section).__name__}")
+            section = {}
+        sections[key] = section
+    template = {**template, **sections}
+    parameters, resources, conditions = sections["Parameters"], sections["Resources"], sections["Conditions"]
+    if not resources:
+        errors.append("Resources section is missing or empty")
+
+    _check_parameters(parameters, errors)
+    _check_resources(resources, conditions, errors, warnings)
+    _check_references(template, parameters, resources, conditions, errors, warnings)
+
+
+def _spec_fingerprint():
+    """
+    Identify the rules cached results were produced under: the spec contents plus VALIDATOR_VERSION.
+    """
+    digest = hashlib.sha256(f"validator-{VALIDATOR_VERSION}\0".encode("utf-8"))
+    with open(RESOURCE_SPEC_PATH, "rb") as f:
+        digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _load_cache(cache_path):
+    if not cache_path or not os.path.exists(cache_path):
+        return {}
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cache.get("fingerprint") != _spec_fingerprint():
+        return {}
+    return cache.get("results", {})
+
+
+def _save_cache(cache_path, results):
+    if not cache_path:
+        return
+    cache_dir = os.path.dirname(cache_path) or "."
+    os.makedirs(cache_dir, exist_ok=True)
+    # A unique temp file per writer, so concurrent validations never clobber each other's write.
+    fd, tmp_path = tempfile.mkstemp(prefix=".validation_cache_", suffix=".tmp", dir=cache_dir)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": _spec_fingerprint(), "results": results}, f)
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def validate_templates(paths, max_workers=None, cache_path=DEFAULT_CACHE_PATH):
+    """
+    Validate many template files across a process pool, reusing cached results by template sha256.
+
+    Returns {path: {"valid", "errors", "warnings", "sha256"}} in the order given.
+    """
+    cache = _load_cache(cache_path)
+    texts = {}
+    hashes = {}
+    for path in paths:
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        hashes[path] = digest
+        if digest not in cache and digest not in texts:
+            texts[digest] = data.decode("utf-8")
+
+    if texts:
+        digests = list(texts)
+        if len(digests) == 1:
+            fresh = [validate_template_text(texts[digests[0]])]
+        else:
+            # Workers map a compiled catalog when one has been built (python catalog.py build).
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                chunksize = max(1, len(digests) // ((max_workers or os.cpu_count() or 1) * 4))
+                fresh = list(pool.map(validate_template_text, (texts[d] for d in digests), chunksize=chunksize))
+        cache.update(zip(digests, fresh))
+        _save_cache(cache_path, cache)
+
+    return {path: {**cache[hashes[path]], "sha256": hashes[path]} for path in paths}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate rendered CloudFormation templates offline")
+    parser.add_argument("paths", nargs="+", help="Template files to validate")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="Result cache file ('' to disable)")
+    args = parser.parse_args()
+
+    results = validate_templates(args.paths, max_workers=args.workers, cache_path=args.cache or None)
+    failed = 0
+    for path, result in results.items():
+        if result["valid"]:
+            print(f"✅ {path}")
+        else:
+            failed += 1
+            print(f"❌ {path}")
+            for error in result["errors"]:
+                print(f"   - {error}")
+        for warning in result["warnings"]:
+            print(f"   ⚠️ {warning}")
+    print(f"{len(results) - failed}/{len(results)} templates passed validation.")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,85 +1,79 @@
-import os
-import json
-from datetime import datetime
-from cleaner.classify import classify_programs
-from generator.cloudformation import generate_cloudformation_from_workload
-from osquery_parser import extract_specs, parse_osquery_dump
-from workload import build_workload
+import asyncio
+import logging
+
+from pipeline import PipelineOptions, run_results_log, run_workload
+
+RESULTS_LOG_SUFFIXES = (".log", ".jsonl", ".ndjson", ".gz")
+
+STAGE_MESSAGES = {
+    "build": "🧾 Building workload.json artifact...",
+    "generate": "📦 Generating CloudFormation template...",
+    "validate": "🔎 Validating CloudFormation template...",
+}
+
+
+def print_progress(event):
+    stage = event["stage"]
+    status = event["status"]
+    if stage == "classify" and status == "started":
+        print(f"🔍 Classifying software components with the {event['backend']} backend...")
+    elif status == "started" and stage in STAGE_MESSAGES:
+        print(STAGE_MESSAGES[stage])
+    elif status == "failed":
+        marker = "⚠️" if event.get("reason") == "no_components" else "❌"
+        print(f"{marker} {event.get('message')}")
+    elif stage == "validate" and status == "finished":
+        for warning in event.get("warnings") or []:
+            print(f"⚠️ {warning}")
+    elif stage == "load" and status == "finished":
+        if event["format"] == "osquery_results_log":
+            print(f"📥 {event['source']}: {event['program_count']} programs from results log.")
+            if event.get("missing_queries"):
+                print(f"⚠️ Missing queries: {', '.join(event['missing_queries'])}")
+        elif event["format"] == "osquery_dump":
+            print(f"📥 Parsed OSQuery dump with {event['program_count']} programs discovered.")
+        else:
+            print(f"ℹ️ Could not parse as OSQuery dump ({event.get('fallback_reason')}); falling back to plain JSON list.")
+            print(f"📥 Loaded {event['program_count']} programs from simple JSON list.")
+        specs = event.get("specs")
+        if specs:
+            print(
+                "🖥️  Detected specs:",
+                f"OS={specs.get('os_name')} {specs.get('os_version')} ({specs.get('platform')}) | "
+                f"CPU={specs.get('cpu_model')} "
+                f"cores={specs.get('cpu_physical_cores')}p/{specs.get('cpu_logical_cores')}l | "
+                f"RAM={specs.get('memory_bytes')} bytes",
+            )
 
 
 def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     input_path = input("Enter the path to your OSQuery discovery JSON file [default: input/programs.json]: ").strip()
     if not input_path:
         input_path = "input/programs.json"
 
-    if not os.path.isfile(input_path):
-        print(f"❌ File not found: {input_path}")
+    options = PipelineOptions(on_progress=print_progress)
+    if input_path.endswith(RESULTS_LOG_SUFFIXES):
+        asyncio.run(run_fleet_log(input_path, options))
         return
 
-    # Try to parse OSQuery multi-block exports; fall back to a simple JSON list
-    raw_programs = []
-    specs = {}
-    parsed = None
-    try:
-        parsed = parse_osquery_dump(input_path)
-        specs = extract_specs(parsed)
-        raw_programs = parsed.get("programs") or []
-        print(f"📥 Parsed OSQuery dump with {len(raw_programs)} programs discovered.")
-    except Exception as e:
-        print(f"ℹ️ Could not parse as OSQuery dump ({e}); falling back to plain JSON list.")
-        with open(input_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            if isinstance(data, list):
-                raw_programs = data
-                print(f"📥 Loaded {len(raw_programs)} programs from simple JSON list.")
-            else:
-                print("❌ Input JSON is not a list of programs.")
-                return
-
-    print("🔍 Classifying software components with GPT...")
-    classified_components = classify_programs(raw_programs)
-
-    if not classified_components:
-        print("⚠️ No middleware or runtimes detected after cleanup.")
+    result = asyncio.run(run_workload(input_path, options))
+    if result["status"] == "invalid":
+        print(f"❌ Template failed validation; artifacts kept in: {result['paths'].get('template')}")
+        return
+    if result["status"] != "ok":
         return
 
-    if specs:
-        print(
-            "🖥️  Detected specs:",
-            f"OS={specs.get('os_name')} {specs.get('os_version')} ({specs.get('platform')}) | "
-            f"CPU={specs.get('cpu_model')} "
-            f"cores={specs.get('cpu_physical_cores')}p/{specs.get('cpu_logical_cores')}l | "
-            f"RAM={specs.get('memory_bytes')} bytes",
-        )
-
-    print("🧾 Building workload.json artifact...")
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    output_dir = os.path.join("output", timestamp)
-    os.makedirs(output_dir, exist_ok=True)
-    output_file = os.path.join(output_dir, "autoblueprint_template.yaml")
-    workload_file = os.path.join(output_dir, "workload.json")
-
-    workload = build_workload(
-        raw_programs=raw_programs,
-        classified_components=classified_components,
-        specs=specs,
-        input_path=input_path,
-        llm_model=os.getenv("GPT_MODEL", "gpt-4"),
-        parsed=parsed,
-    )
-
-    with open(workload_file, "w", encoding="utf-8") as f:
-        json.dump(workload, f, indent=2)
-
-    with open(workload_file, "r", encoding="utf-8") as f:
-        workload = json.load(f)
+    print(f"✅ CloudFormation template saved to: {result['paths']['template']}")
+    print(f"✅ Workload artifact saved to: {result['paths']['workload']}")
 
-    print("📦 Generating CloudFormation template...")
-    with open(output_file, "w") as f:
-        f.write(generate_cloudformation_from_workload(workload))
 
-    print(f"✅ CloudFormation template saved to: {output_file}")
-    print(f"✅ Workload artifact saved to: {workload_file}")
+async def run_fleet_log(input_path, options):
+    async for result in run_results_log(input_path, options):
+        if result["status"] == "ok":
+            print(f"✅ {result['source']}: artifacts saved to {result['paths']['workload']}")
+        elif result["status"] == "invalid":
+            print(f"❌ {result['source']}: template failed validation ({result['paths'].get('template')})")
 
 
 if __name__ == "__main__":
@@ -3,6 +3,8 @@ from dotenv import load_dotenv
 from openai import OpenAI
 import boto3
 
+from catalog import get_catalog
+
 load_dotenv()
 
 api_key = os.getenv("OPENAI_API_KEY")
@@ -11,17 +13,9 @@ if not api_key:
 
 client = OpenAI(api_key=api_key)
 
-# Optional: Map OS names to SSM Parameter paths for AMI lookup
-SSM_AMI_PATHS = {
-    "amazon linux 2": "/aws/service/ami-amazon-linux-latest/amzn2-ami-hvm-x86_64-gp2",
-    "ubuntu 22.04": "/aws/service/canonical/ubuntu/server/22.04/stable/current/amd64/hvm/ebs-gp2/ami-id",
-    "ubuntu 20.04": "/aws/service/canonical/ubuntu/server/20.04/stable/current/amd64/hvm/ebs-gp2/ami-id",
-    "windows server 2019": "/aws/service/ami-windows-latest/Windows_Server-2019-English-Full-Base"
-}
-
 def get_latest_ami(region, os_type):
     os_key = os_type.strip().lower()
-    path = SSM_AMI_PATHS.get(os_key)
+    path = get_catalog().ami_path(os_key)
     if not path:
         raise ValueError(f"No known AMI path for OS type: {os_type}")
 
@@ -1,6 +1,12 @@
+import gzip
+import hashlib
 import json
+import logging
+import os
+import tempfile
+from collections import OrderedDict
 from json import JSONDecodeError
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 # Expected order for concatenated queries in discovery.sql
 QUERY_ORDER = [
@@ -12,6 +18,24 @@ QUERY_ORDER = [
     "programs",
 ]
 
+# Columns that identify which query produced a block, so a missing query
+# does not shift every later block onto the wrong table.
+QUERY_SIGNATURES = {
+    "os_version": ("major", "minor", "platform_like", "codename"),
+    "cpu_info": ("cpu_brand", "cpu_physical_cores", "cpu_logical_cores", "number_of_cores", "logical_processors"),
+    "memory_info": ("memory_total", "memory_free", "total_bytes"),
+    "interface_details": ("interface", "mac", "mtu"),
+    "processes": ("pid", "cmdline", "parent"),
+    "programs": ("publisher", "install_location", "install_date", "identifying_number", "maintainer", "package_group"),
+}
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_OPEN_HOSTS = 1024
+DEFAULT_MAX_ROWS_PER_QUERY = 50000
+# Seconds past an event-format run's unixTime after which it is treated as finished.
+DEFAULT_EVENT_RUN_WINDOW = 60
+
 
 def _parse_concatenated_arrays(text: str) -> List[Any]:
     """
@@ -38,23 +62,349 @@ def _parse_concatenated_arrays(text: str) -> List[Any]:
     return values
 
 
+def _identify_block(block: Any) -> Optional[str]:
+    if not isinstance(block, list) or not block or not isinstance(block[0], dict):
+        return None
+    columns = block[0].keys()
+    for name, signature in QUERY_SIGNATURES.items():
+        if any(column in columns for column in signature):
+            return name
+    return None
+
+
 def parse_osquery_dump(path: str) -> Dict[str, Any]:
     """
     Parse an OSQuery export produced by discovery.sql into a structured dict.
 
     The export is expected to be multiple JSON arrays concatenated in the order of QUERY_ORDER.
+    Blocks whose columns match QUERY_SIGNATURES are assigned by content; the rest fall back
+    to their position.
     """
     with open(path, "r", encoding="utf-8") as f:
         text = f.read()
 
     blocks = _parse_concatenated_arrays(text)
-    parsed: Dict[str, Any] = {}
-    for i, name in enumerate(QUERY_ORDER):
-        parsed[name] = blocks[i] if i < len(blocks) else []
+    assigned: Dict[str, Any] = {}
+    identified = [_identify_block(block) for block in blocks]
+    for block, name in zip(blocks, identified):
+        if name and name not in assigned:
+            assigned[name] = block
+    for i, (block, name) in enumerate(zip(blocks, identified)):
+        if name is None and i < len(QUERY_ORDER) and QUERY_ORDER[i] not in assigned:
+            assigned[QUERY_ORDER[i]] = block
+
+    parsed: Dict[str, Any] = {name: assigned.get(name, []) for name in QUERY_ORDER}
+    parsed["missing_queries"] = [name for name in QUERY_ORDER if name not in assigned]
     parsed["raw_blocks"] = blocks
     return parsed
 
 
+def _route_query(name: Optional[str]) -> Optional[str]:
+    """
+    Map a scheduled query name such as "pack_discovery_programs" or "pack/discovery/programs"
+    onto a QUERY_ORDER table.
+    """
+    if not name:
+        return None
+    if name in QUERY_ORDER:
+        return name
+    for table in sorted(QUERY_ORDER, key=len, reverse=True):
+        if name.endswith(table) and name[-len(table) - 1] in "_/:.-":
+            return table
+    return None
+
+
+def _row_key(row: Dict[str, Any]) -> str:
+    return json.dumps(row, sort_keys=True)
+
+
+LogEvent = Tuple[str, str, str, List[Dict[str, Any]], Optional[Tuple[Any, ...]]]
+
+
+def _iter_log_events(record: Dict[str, Any]) -> Iterator[LogEvent]:
+    """
+    Yield (host, query, action, rows, batch) for one osqueryd results or distributed-write record.
+
+    ``action`` is "snapshot" (replace the table), "added" or "removed". ``batch`` is None when
+    the record carries the whole result of one query run; event-format lines carry a single row
+    each, and ``batch`` identifies the run they belong to.
+    """
+    if isinstance(record.get("queries"), dict):
+        host = record.get("hostIdentifier") or record.get("node_key")
+        for query, rows in record["queries"].items():
+            yield host, query, "snapshot", rows or [], None
+        return
+
+    host = record.get("hostIdentifier")
+    query = record.get("name")
+    action = record.get("action")
+    if "snapshot" in record:
+        yield host, query, "snapshot", record.get("snapshot") or [], None
+    elif "diffResults" in record:
+        diff = record.get("diffResults") or {}
+        if diff.get("removed"):
+            yield host, query, "removed", diff["removed"], None
+        yield host, query, "added", diff.get("added") or [], None
+    elif action in ("added", "removed", "snapshot") and isinstance(record.get("columns"), dict):
+        batch = (record.get("epoch"), record.get("counter"), record.get("unixTime") or record.get("calendarTime"))
+        yield host, query, action, [record["columns"]], batch
+
+
+def _run_time(batch: Optional[Tuple[Any, ...]]) -> Optional[int]:
+    try:
+        return int(batch[2]) if batch else None
+    except (TypeError, ValueError):
+        return None
+
+
+class _HostBuffer:
+    def __init__(self, host: str):
+        self.host = host
+        self.tables: Dict[str, "OrderedDict[str, Dict[str, Any]]"] = {}
+        self.truncated: set = set()
+        # Event-format tables fed one row per line; a run stays open until it is known to be over.
+        self.runs: Dict[str, Tuple[Any, ...]] = {}
+        self.streaming: Dict[str, Optional[int]] = {}
+        self.yielded_hash: Optional[str] = None
+
+    def apply(
+        self,
+        table: str,
+        action: str,
+        rows: List[Dict[str, Any]],
+        max_rows: int,
+        batch: Optional[Tuple[Any, ...]] = None,
+    ) -> None:
+        # osqueryd logs one query run at a time per host, so a row from another run ends the open ones.
+        for other in [t for t in self.streaming if t != table or self.runs.get(t) != batch]:
+            del self.streaming[other]
+        if batch is None:
+            self.runs.pop(table, None)
+        else:
+            same_run = self.runs.get(table) == batch
+            self.runs[table] = batch
+            self.streaming[table] = _run_time(batch)
+            # Event-format snapshot rows arrive one per line: only the first row of a run resets the table.
+            if action == "snapshot" and same_run:
+                action = "added"
+        if action == "snapshot":
+            self.tables[table] = OrderedDict()
+            self.truncated.discard(table)
+        current = self.tables.setdefault(table, OrderedDict())
+        for row in rows:
+            if not isinstance(row, dict):
+                continue
+            key = _row_key(row)
+            if action == "removed":
+                current.pop(key, None)
+            elif key in current or len(current) < max_rows:
+                current[key] = row
+            elif table not in self.truncated:
+                self.truncated.add(table)
+                logger.warning("Host %s: %s exceeds %d rows; further rows are not kept", self.host, table, max_rows)
+
+    def close_runs_before(self, cutoff: int) -> bool:
+        """
+        Close event-format runs logged at or before ``cutoff`` (unixTime); return True if any closed.
+        """
+        closed = [t for t, at in self.streaming.items() if at is not None and at <= cutoff]
+        for table in closed:
+            del self.streaming[table]
+        return bool(closed)
+
+    def is_complete(self, required: Tuple[str, ...]) -> bool:
+        return all(table in self.tables and table not in self.streaming for table in required)
+
+    def content_hash(self) -> str:
+        digest = hashlib.sha256()
+        for table in sorted(self.tables):
+            digest.update(table.encode("utf-8"))
+            for key in sorted(self.tables[table]):
+                digest.update(b"\0" + key.encode("utf-8"))
+        return digest.hexdigest()
+
+    def to_parsed(self, required: Tuple[str, ...]) -> Dict[str, Any]:
+        parsed: Dict[str, Any] = {name: list(self.tables.get(name, {}).values()) for name in QUERY_ORDER}
+        parsed["host_identifier"] = self.host
+        parsed["missing_queries"] = [name for name in required if name not in self.tables]
+        parsed["truncated_queries"] = sorted(self.truncated)
+        return parsed
+
+    def dump(self, path: str) -> None:
+        state = {
+            "host": self.host,
+            "tables": {table: list(rows.items()) for table, rows in self.tables.items()},
+            "truncated": sorted(self.truncated),
+            "runs": self.runs,
+            "streaming": self.streaming,
+            "yielded_hash": self.yielded_hash,
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+
+    @classmethod
+    def load(cls, path: str) -> "_HostBuffer":
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        buffer = cls(state["host"])
+        buffer.tables = {table: OrderedDict(rows) for table, rows in state["tables"].items()}
+        buffer.truncated = set(state["truncated"])
+        buffer.runs = {table: tuple(batch) for table, batch in state["runs"].items()}
+        buffer.streaming = state["streaming"]
+        buffer.yielded_hash = state["yielded_hash"]
+        return buffer
+
+
+class _HostStore:
+    """
+    Per-host state: the ``max_open`` most recently updated hosts in memory, the rest spilled to disk.
+
+    State is kept after a host is yielded, so later differential rows still apply to it.
+    """
+
+    def __init__(self, max_open: int, spill_dir: str):
+        self.max_open = max(1, max_open)
+        self.spill_dir = spill_dir
+        self.open: "OrderedDict[str, _HostBuffer]" = OrderedDict()
+        self.spilled: Dict[str, str] = {}
+        # Newest open event-format run per spilled host, so time-based closing needs no reload.
+        self.spilled_runs: Dict[str, int] = {}
+
+    def get(self, host: str) -> _HostBuffer:
+        buffer = self.open.get(host)
+        if buffer is not None:
+            self.open.move_to_end(host)
+            return buffer
+        path = self.spilled.pop(host, None)
+        self.spilled_runs.pop(host, None)
+        if path is not None:
+            buffer = _HostBuffer.load(path)
+            os.remove(path)
+        else:
+            buffer = _HostBuffer(host)
+        self.open[host] = buffer
+        while len(self.open) > self.max_open:
+            _, evicted = self.open.popitem(last=False)
+            self.spill(evicted)
+        return buffer
+
+    def spill(self, buffer: _HostBuffer) -> None:
+        path = self.spilled.get(buffer.host)
+        if path is None:
+            digest = hashlib.sha1(buffer.host.encode("utf-8")).hexdigest()
+            path = self.spilled[buffer.host] = os.path.join(self.spill_dir, f"{digest}.json")
+        buffer.dump(path)
+        times = [at for at in buffer.streaming.values() if at is not None]
+        if times:
+            self.spilled_runs[buffer.host] = max(times)
+
+    def hosts_with_runs_before(self, cutoff: int) -> Iterator[_HostBuffer]:
+        """
+        Yield every host (open or spilled) with an event-format run logged at or before ``cutoff``.
+        """
+        for buffer in list(self.open.values()):
+            if buffer.close_runs_before(cutoff):
+                yield buffer
+        for host in [h for h, at in self.spilled_runs.items() if at <= cutoff]:
+            del self.spilled_runs[host]
+            buffer = _HostBuffer.load(self.spilled[host])
+            buffer.close_runs_before(cutoff)
+            yield buffer
+            self.spill(buffer)
+
+    def all(self) -> Iterator[_HostBuffer]:
+        yield from self.open.values()
+        for path in self.spilled.values():
+            yield _HostBuffer.load(path)
+
+
+def _open_log(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def iter_results_log(
+    path: str,
+    required: Optional[List[str]] = None,
+    max_open_hosts: int = DEFAULT_MAX_OPEN_HOSTS,
+    max_rows_per_query: int = DEFAULT_MAX_ROWS_PER_QUERY,
+    event_run_window: int = DEFAULT_EVENT_RUN_WINDOW,
+    spill_dir: Optional[str] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Stream an osqueryd results log (JSON lines, hosts interleaved) and yield one parsed dict per host.
+
+    Rows are routed by hostIdentifier and query name. Snapshot, batched differential and
+    event-format lines are supported, as are distributed-write payloads. A host is yielded as
+    soon as every ``required`` query (default: QUERY_ORDER) has a finished result.
+
+    Snapshots, batched diffs and distributed payloads finish with their line. Event-format
+    lines carry one row each and no end marker, so an event-format run is treated as finished
+    once the host logs a row from another run, once the log's clock (unixTime) is more than
+    ``event_run_window`` seconds past it, or at end of file.
+
+    Host state outlives each yield, so later diffs and events are applied to what was already
+    seen and the host is yielded again; scheduled packs resend every host each interval, so a
+    host is only re-yielded when its tables actually changed. At most ``max_open_hosts`` hosts
+    are held in memory; the rest are spilled to ``spill_dir`` (a temporary directory by default)
+    rather than yielded early, so no rows are dropped. Hosts that never finished every required
+    query are yielded at end of file with what they lack in ``missing_queries``.
+    """
+    required_tables = tuple(required or QUERY_ORDER)
+    clock: Optional[int] = None
+    swept_at: Optional[int] = None
+
+    def release(buffer: _HostBuffer) -> Optional[Dict[str, Any]]:
+        content_hash = buffer.content_hash()
+        if buffer.yielded_hash == content_hash:
+            return None
+        buffer.yielded_hash = content_hash
+        return buffer.to_parsed(required_tables)
+
+    with tempfile.TemporaryDirectory(prefix="osquery_hosts_", dir=spill_dir) as tmp_dir, _open_log(path) as f:
+        store = _HostStore(max_open_hosts, tmp_dir)
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except JSONDecodeError as exc:
+                raise ValueError(f"Failed to decode results log line {line_no}: {exc}") from exc
+            if not isinstance(record, dict):
+                continue
+
+            for host, query, action, rows, batch in _iter_log_events(record):
+                table = _route_query(query)
+                if not host or table is None:
+                    continue
+                buffer = store.get(host)
+                buffer.apply(table, action, rows, max_rows_per_query, batch)
+                at = _run_time(batch)
+                if at is not None:
+                    clock = at if clock is None else max(clock, at)
+                if buffer.is_complete(required_tables):
+                    released = release(buffer)
+                    if released is not None:
+                        yield released
+
+            # Sweep for event-format runs the log has moved past, at most once per window.
+            if clock is not None and (swept_at is None or clock - swept_at >= event_run_window):
+                swept_at = clock
+                for buffer in store.hosts_with_runs_before(clock - event_run_window):
+                    if buffer.is_complete(required_tables):
+                        released = release(buffer)
+                        if released is not None:
+                            yield released
+
+        for buffer in store.all():
+            buffer.streaming.clear()
+            released = release(buffer)
+            if released is not None:
+                yield released
+
+
 def extract_specs(parsed: Dict[str, Any]) -> Dict[str, Optional[Any]]:
     """
     Extract basic server specs (OS, CPU, memory) from parsed OSQuery tables.
@@ -0,0 +1,516 @@
+import asyncio
+import functools
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional
+
+from cleaner.backends import get_backend
+from generator.cloudformation import generate_cloudformation_from_workload
+from generator.validate import validate_template_text
+from osquery_parser import extract_specs, iter_results_log, parse_osquery_dump
+from program_index import index_programs
+from workload import build_workload
+
+STAGES = ("load", "classify", "build", "generate", "validate", "write")
+
+_UNSAFE_PATH_CHARS = re.compile(r"[^\w.-]")
+
+
+class PipelineError(Exception):
+    """Raised when a pipeline stage cannot produce a usable result."""
+
+    def __init__(self, stage: str, message: str, status: str = "failed"):
+        super().__init__(f"{stage}: {message}")
+        self.stage = stage
+        self.message = message
+        self.status = status
+
+
+def _stage(name: str):
+    """
+    Report anything a stage raises as a PipelineError for that stage, so one bad input fails alone.
+    """
+
+    def decorate(func):
+        @functools.wraps(func)
+        async def run(*args, **kwargs):
+            try:
+                return await func(*args, **kwargs)
+            except PipelineError:
+                raise
+            except Exception as exc:
+                raise PipelineError(name, f"{type(exc).__name__}: {exc}") from exc
+
+        return run
+
+    return decorate
+
+
+def safe_path_component(value: str, default: str = "workload") -> str:
+    """
+    Reduce ``value`` (a host identifier, upload name, ...) to a single safe file name component.
+    """
+    cleaned = _UNSAFE_PATH_CHARS.sub("_", value or "").strip(".")
+    return cleaned or default
+
+
+@dataclass
+class PipelineOptions:
+    """
+    Knobs shared by every workload run through the pipeline.
+
+    One options object can be reused across many concurrent runs; the
+    classification semaphore it owns is what bounds concurrent LLM calls.
+    """
+
+    classifier_backend: Optional[str] = None
+    output_root: Optional[str] = "output"
+    classify_concurrency: int = 4
+    queue_size: int = 8
+    on_progress: Optional[Callable[[Dict[str, Any]], Any]] = None
+    classify_limiter: Optional[asyncio.Semaphore] = field(default=None, repr=False)
+
+    def backend(self):
+        try:
+            return get_backend(self.classifier_backend)
+        except Exception as exc:
+            raise PipelineError("classify", f"Could not load classifier backend: {exc}") from exc
+
+    def classify_slots(self) -> asyncio.Semaphore:
+        if self.classify_limiter is None:
+            self.classify_limiter = asyncio.Semaphore(max(1, self.classify_concurrency))
+        return self.classify_limiter
+
+
+async def _emit(options: PipelineOptions, source: str, stage: str, status: str, **detail: Any) -> None:
+    if options.on_progress is None:
+        return
+    event = {"source": source, "stage": stage, "status": status, **detail}
+    result = options.on_progress(event)
+    if asyncio.iscoroutine(result):
+        await result
+
+
+def _check_programs(programs: List[Any]) -> List[Dict[str, Any]]:
+    bad = next((idx for idx, item in enumerate(programs) if not isinstance(item, dict)), None)
+    if bad is not None:
+        raise PipelineError("load", f"Program entry {bad} is not an object: {programs[bad]!r:.80}")
+    return programs
+
+
+def load_source(input_path: str) -> Dict[str, Any]:
+    """
+    Load an OSQuery multi-block export, falling back to a plain JSON list of programs.
+    """
+    if not os.path.isfile(input_path):
+        raise PipelineError("load", f"File not found: {input_path}")
+
+    try:
+        parsed = parse_osquery_dump(input_path)
+        programs = parsed.get("programs") or []
+        specs = extract_specs(parsed)
+    except Exception as exc:
+        fallback_reason = str(exc)
+    else:
+        return {
+            "format": "osquery_dump",
+            "raw_programs": _check_programs(programs),
+            "specs": specs,
+            "parsed": parsed,
+        }
+
+    try:
+        with open(input_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except ValueError as exc:
+        raise PipelineError("load", f"Could not parse input as JSON: {exc}") from exc
+    if not isinstance(data, list):
+        raise PipelineError("load", "Input JSON is not a list of programs.")
+    return {
+        "format": "program_list",
+        "raw_programs": _check_programs(data),
+        "specs": {},
+        "parsed": None,
+        "fallback_reason": fallback_reason,
+    }
+
+
+@_stage("load")
+async def load_stage(input_path: str, options: PipelineOptions) -> Dict[str, Any]:
+    await _emit(options, input_path, "load", "started")
+    loaded = await asyncio.to_thread(load_source, input_path)
+    loaded["program_index"] = await asyncio.to_thread(index_programs, loaded["raw_programs"])
+    await _emit(
+        options,
+        input_path,
+        "load",
+        "finished",
+        format=loaded["format"],
+        program_count=len(loaded["raw_programs"]),
+        specs=loaded["specs"],
+        fallback_reason=loaded.get("fallback_reason"),
+    )
+    return loaded
+
+
+@_stage("classify")
+async def classify_stage(input_path: str, loaded: Dict[str, Any], options: PipelineOptions) -> List[Dict[str, Any]]:
+    backend = options.backend()
+    await _emit(options, input_path, "classify", "started", backend=backend.name)
+    async with options.classify_slots():
+        components = await asyncio.to_thread(
+            backend.classify, loaded["raw_programs"], program_index=loaded.get("program_index")
+        )
+    if not components:
+        raise PipelineError("classify", "No middleware or runtimes detected after cleanup.", status="no_components")
+    await _emit(options, input_path, "classify", "finished", component_count=len(components))
+    return components
+
+
+@_stage("build")
+async def build_stage(
+    input_path: str,
+    loaded: Dict[str, Any],
+    components: List[Dict[str, Any]],
+    options: PipelineOptions,
+) -> Dict[str, Any]:
+    backend = options.backend()
+    await _emit(options, input_path, "build", "started")
+    workload = await asyncio.to_thread(
+        build_workload,
+        raw_programs=loaded["raw_programs"],
+        classified_components=components,
+        specs=loaded["specs"],
+        input_path=input_path,
+        llm_provider=backend.provider,
+        llm_model=backend.model,
+        parsed=loaded["parsed"],
+        workload_id=loaded.get("workload_id"),
+        input_files=loaded.get("input_files"),
+        program_index=loaded.get("program_index"),
+    )
+    # Round-trip through JSON so generation sees exactly what workload.json records.
+    workload = json.loads(json.dumps(workload))
+    await _emit(options, input_path, "build", "finished")
+    return workload
+
+
+@_stage("generate")
+async def generate_stage(input_path: str, workload: Dict[str, Any], options: PipelineOptions) -> str:
+    await _emit(options, input_path, "generate", "started")
+    template = await asyncio.to_thread(generate_cloudformation_from_workload, workload)
+    await _emit(options, input_path, "generate", "finished")
+    return template
+
+
+@_stage("validate")
+async def validate_stage(input_path: str, template: str, options: PipelineOptions) -> Dict[str, Any]:
+    await _emit(options, input_path, "validate", "started")
+    validation = await asyncio.to_thread(validate_template_text, template)
+    await _emit(
+        options,
+        input_path,
+        "validate",
+        "finished",
+        valid=validation["valid"],
+        errors=validation["errors"],
+        warnings=validation["warnings"],
+    )
+    return validation
+
+
+def write_artifacts(
+    output_root: str, workload: Dict[str, Any], template: str, validation: Optional[Dict[str, Any]] = None
+) -> Dict[str, str]:
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    workload_id = safe_path_component(workload.get("metadata", {}).get("workload_id"))
+    output_dir = os.path.join(output_root, timestamp)
+    suffix = 0
+    # Concurrent runs can finish within the same second; claiming the directory atomically
+    # means two runs never share (and overwrite) one.
+    while True:
+        try:
+            os.makedirs(output_dir, exist_ok=False)
+            break
+        except FileExistsError:
+            suffix += 1
+            output_dir = os.path.join(output_root, f"{timestamp}_{workload_id}_{suffix}")
+
+    workload_file = os.path.join(output_dir, "workload.json")
+    template_file = os.path.join(output_dir, "autoblueprint_template.yaml")
+    with open(workload_file, "w", encoding="utf-8") as f:
+        json.dump(workload, f, indent=2)
+    with open(template_file, "w", encoding="utf-8") as f:
+        f.write(template)
+    paths = {"workload": workload_file, "template": template_file}
+    if validation is not None:
+        paths["validation"] = os.path.join(output_dir, "validation.json")
+        with open(paths["validation"], "w", encoding="utf-8") as f:
+            json.dump(validation, f, indent=2)
+    return paths
+
+
+@_stage("write")
+async def write_stage(
+    input_path: str,
+    workload: Dict[str, Any],
+    template: str,
+    options: PipelineOptions,
+    validation: Optional[Dict[str, Any]] = None,
+) -> Dict[str, str]:
+    if not options.output_root:
+        return {}
+    await _emit(options, input_path, "write", "started")
+    paths = await asyncio.to_thread(write_artifacts, options.output_root, workload, template, validation)
+    await _emit(options, input_path, "write", "finished", paths=paths)
+    return paths
+
+
+def _result(source: str, status: str, **fields: Any) -> Dict[str, Any]:
+    result = {
+        "source": source,
+        "status": status,
+        "workload": None,
+        "template": None,
+        "validation": None,
+        "paths": {},
+        "error": None,
+    }
+    result.update(fields)
+    return result
+
+
+async def _failure(options: PipelineOptions, source: str, exc: Exception, stage: str = "load") -> Dict[str, Any]:
+    if not isinstance(exc, PipelineError):
+        exc = PipelineError(stage, f"{type(exc).__name__}: {exc}")
+    try:
+        await _emit(options, source, exc.stage, "failed", reason=exc.status, message=exc.message)
+    except Exception:
+        # A broken progress callback must not stop the failure from being reported.
+        pass
+    return _result(source, exc.status, error={"stage": exc.stage, "message": exc.message})
+
+
+async def _finish(
+    source: str, loaded: Dict[str, Any], components: List[Dict[str, Any]], options: PipelineOptions
+) -> Dict[str, Any]:
+    """
+    Build, generate, validate and write one workload.
+
+    Artifacts are written even when validation fails so they can be inspected,
+    but only "ok" results should be handed to the deployer.
+    """
+    workload = await build_stage(source, loaded, components, options)
+    template = await generate_stage(source, workload, options)
+    validation = await validate_stage(source, template, options)
+    paths = await write_stage(source, workload, template, options, validation)
+    if not validation["valid"]:
+        await _emit(options, source, "validate", "failed", reason="invalid", message="; ".join(validation["errors"]))
+    status = "ok" if validation["valid"] else "invalid"
+    return _result(source, status, workload=workload, template=template, validation=validation, paths=paths)
+
+
+async def run_workload(
+    source: str,
+    options: Optional[PipelineOptions] = None,
+    workload_id: Optional[str] = None,
+    input_files: Optional[List[Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """
+    Run one discovery export through every stage and return a structured result.
+
+    ``workload_id`` and ``input_files`` override what workload.json records about the
+    input, e.g. when ``source`` is only a temporary copy of an upload.
+
+    Stage failures are reported in the result rather than raised; cancellation
+    propagates to the caller unchanged.
+    """
+    options = options or PipelineOptions()
+    try:
+        loaded = await load_stage(source, options)
+        if workload_id:
+            loaded["workload_id"] = workload_id
+        if input_files is not None:
+            loaded["input_files"] = input_files
+        components = await classify_stage(source, loaded, options)
+        return await _finish(source, loaded, components, options)
+    except Exception as exc:
+        return await _failure(options, source, exc)
+
+
+async def _load_each(sources: Iterable[str], options: PipelineOptions) -> AsyncIterator[Any]:
+    for source in sources:
+        try:
+            yield source, await load_stage(source, options)
+        except Exception as exc:
+            yield source, exc
+
+
+def host_source(log_path: str, parsed: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Wrap one host's parsed results-log tables in the shape load_source returns.
+    """
+    host = parsed["host_identifier"]
+    return {
+        "format": "osquery_results_log",
+        "raw_programs": parsed.get("programs") or [],
+        "specs": extract_specs(parsed),
+        "parsed": parsed,
+        "workload_id": host,
+        # Hashing a multi-gigabyte shared log per host would defeat streaming.
+        "input_files": [{"path": log_path, "sha256": None, "host_identifier": host}],
+    }
+
+
+async def _stream_hosts(log_path: str, options: PipelineOptions, **stream_options: Any) -> AsyncIterator[Any]:
+    """
+    Read a results log on a worker thread, handing each completed host to the event loop.
+
+    The reader blocks on the bounded queue, so a slow pipeline stops the log from being read ahead.
+    """
+    loop = asyncio.get_running_loop()
+    hosts: asyncio.Queue = asyncio.Queue(maxsize=options.queue_size)
+    done = object()
+    stop = threading.Event()
+
+    def put(item):
+        asyncio.run_coroutine_threadsafe(hosts.put(item), loop).result()
+
+    def reader():
+        try:
+            for parsed in iter_results_log(log_path, **stream_options):
+                put(parsed)
+                if stop.is_set():
+                    return
+        except Exception as exc:
+            put(PipelineError("load", f"{type(exc).__name__}: {exc}"))
+        finally:
+            if not stop.is_set():
+                put(done)
+
+    reading = asyncio.create_task(asyncio.to_thread(reader))
+    try:
+        while (parsed := await hosts.get()) is not done:
+            if isinstance(parsed, Exception):
+                yield log_path, parsed
+                continue
+            source = f"{log_path}#{parsed['host_identifier']}"
+            try:
+                loaded = host_source(log_path, parsed)
+                loaded["program_index"] = await asyncio.to_thread(index_programs, loaded["raw_programs"])
+            except Exception as exc:
+                yield source, exc
+                continue
+            await _emit(
+                options,
+                source,
+                "load",
+                "finished",
+                format=loaded["format"],
+                program_count=len(loaded["raw_programs"]),
+                specs=loaded["specs"],
+                missing_queries=parsed["missing_queries"],
+            )
+            yield source, loaded
+        await reading
+    finally:
+        stop.set()
+        # Drain so a reader blocked on the full queue wakes up and observes ``stop``.
+        while not reading.done():
+            while not hosts.empty():
+                hosts.get_nowait()
+            await asyncio.sleep(0.01)
+
+
+async def _run_stages(loaded_items: AsyncIterator[Any], options: PipelineOptions) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Push loaded sources through classify/build/generate/write, yielding results as they complete.
+
+    Stages are connected by bounded queues so a slow stage (usually
+    classification) pushes back on loading instead of buffering every host.
+    """
+    loaded_q: asyncio.Queue = asyncio.Queue(maxsize=options.queue_size)
+    classified_q: asyncio.Queue = asyncio.Queue(maxsize=options.queue_size)
+    results_q: asyncio.Queue = asyncio.Queue(maxsize=options.queue_size)
+    done = object()
+    classify_workers = max(1, options.classify_concurrency)
+
+    async def loader():
+        source = None
+        try:
+            async for source, loaded in loaded_items:
+                if isinstance(loaded, Exception):
+                    await results_q.put(await _failure(options, source, loaded))
+                else:
+                    await loaded_q.put((source, loaded))
+        except Exception as exc:
+            # The source iterator itself broke; report it and still shut the stages down.
+            await results_q.put(await _failure(options, source, exc))
+        for _ in range(classify_workers):
+            await loaded_q.put(done)
+
+    async def classifier():
+        while (item := await loaded_q.get()) is not done:
+            source, loaded = item
+            try:
+                components = await classify_stage(source, loaded, options)
+            except Exception as exc:
+                await results_q.put(await _failure(options, source, exc, "classify"))
+                continue
+            await classified_q.put((source, loaded, components))
+        await classified_q.put(done)
+
+    async def finisher():
+        remaining = classify_workers
+        while remaining:
+            item = await classified_q.get()
+            if item is done:
+                remaining -= 1
+                continue
+            source, loaded, components = item
+            try:
+                result = await _finish(source, loaded, components, options)
+            except Exception as exc:
+                result = await _failure(options, source, exc, "build")
+            await results_q.put(result)
+        await results_q.put(done)
+
+    tasks = [asyncio.create_task(loader()), asyncio.create_task(finisher())]
+    tasks += [asyncio.create_task(classifier()) for _ in range(classify_workers)]
+    try:
+        while (result := await results_q.get()) is not done:
+            yield result
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def run_workloads(
+    sources: Iterable[str], options: Optional[PipelineOptions] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run many exports concurrently, yielding results as they complete.
+    """
+    options = options or PipelineOptions()
+    async for result in _run_stages(_load_each(sources, options), options):
+        yield result
+
+
+async def run_results_log(
+    log_path: str, options: Optional[PipelineOptions] = None, **stream_options: Any
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Stream an osqueryd results log and run each host through the pipeline as soon as it is complete.
+
+    ``stream_options`` are passed to osquery_parser.iter_results_log (``required``,
+    ``max_open_hosts``, ``max_rows_per_query``, ``event_run_window``, ``spill_dir``).
+    """
+    options = options or PipelineOptions()
+    async for result in _run_stages(_stream_hosts(log_path, options, **stream_options), options):
+        yield result
@@ -0,0 +1,236 @@
+import hashlib
+import json
+import math
+import re
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+NAME_KEYS = ("name", "program", "display_name", "product")
+# Match methods precise enough to identify the installed record, not just a related product.
+# "other_version" is a normalized match whose numbers disagree ("Python 3" vs "Python 2.7.18").
+RECORD_METHODS = frozenset({"exact", "normalized"})
+MIN_FUZZY_SIMILARITY = 0.6
+INDEX_CACHE_SIZE = 32
+LOOKUP_CACHE_SIZE = 4096
+
+_TOKEN_RE = re.compile(r"[a-z+#]+|\d+")
+# Tokens that describe the build rather than the product.
+_BUILD_TOKENS = frozenset({"x", "bit", "win", "v", "sp", "update", "build", "release"})
+
+
+class ProgramMatch(NamedTuple):
+    program: Dict[str, Any]
+    score: float
+    method: str
+
+
+def program_name(record: Dict[str, Any]) -> str:
+    for key in NAME_KEYS:
+        value = record.get(key)
+        if value:
+            return value
+    return "unknown"
+
+
+def tokenize(name: Optional[str]) -> Tuple[str, ...]:
+    """
+    Lowercase ``name`` and split it into alphabetic and numeric tokens.
+    """
+    return tuple(_TOKEN_RE.findall((name or "").lower()))
+
+
+def strip_versions(tokens: Tuple[str, ...]) -> Tuple[str, ...]:
+    """
+    Drop version numbers and architecture/build markers, keeping the product words.
+    """
+    return tuple(t for t in tokens if not t.isdigit() and t not in _BUILD_TOKENS)
+
+
+def numbers(tokens: Tuple[str, ...]) -> frozenset:
+    return frozenset(t for t in tokens if t.isdigit())
+
+
+def trigrams(tokens: Tuple[str, ...]) -> frozenset:
+    padded = "  " + " ".join(tokens) + " "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class ProgramIndex:
+    """
+    Lookup structure over one host's program records.
+
+    Names are matched exactly, then on their version-stripped key, then by
+    whole-token key prefix, then by token containment, and finally by trigram
+    similarity, so "Apache Tomcat 9.0.65" finds "Apache Tomcat" and vice versa.
+    """
+
+    def __init__(self, programs):
+        self.programs: List[Dict[str, Any]] = list(programs or [])
+        self._exact: Dict[str, List[int]] = {}
+        self._normalized: Dict[str, List[int]] = {}
+        self._tokens: Dict[str, List[int]] = {}
+        self._trigrams: Dict[str, List[str]] = {}
+        self._gram_sets: Dict[str, frozenset] = {}
+        self._numbers: Dict[int, frozenset] = {}
+
+        for idx, program in enumerate(self.programs):
+            name = program_name(program).strip().lower()
+            if not name:
+                continue
+            self._exact.setdefault(name, []).append(idx)
+            tokens = tokenize(name)
+            self._numbers[idx] = numbers(tokens)
+            key_tokens = strip_versions(tokens)
+            if not key_tokens:
+                continue
+            key = " ".join(key_tokens)
+            self._normalized.setdefault(key, []).append(idx)
+            for token in set(key_tokens):
+                self._tokens.setdefault(token, []).append(idx)
+
+        for key in self._normalized:
+            grams = trigrams(tuple(key.split(" ")))
+            self._gram_sets[key] = grams
+            for gram in grams:
+                self._trigrams.setdefault(gram, []).append(key)
+        self._sorted_keys = sorted(self._normalized)
+
+        self.lookup = lru_cache(maxsize=LOOKUP_CACHE_SIZE)(self._lookup)
+
+    def __len__(self):
+        return len(self.programs)
+
+    def names(self) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Group program records by their lowercased name.
+        """
+        return {name: [self.programs[i] for i in ids] for name, ids in self._exact.items()}
+
+    def normalized_names(self) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Group program records by their version-stripped key.
+        """
+        return {key: [self.programs[i] for i in ids] for key, ids in self._normalized.items()}
+
+    def records(self, key: str) -> List[Dict[str, Any]]:
+        """
+        Return the program records filed under a version-stripped key.
+        """
+        return [self.programs[i] for i in self._normalized.get(key, ())]
+
+    def _records(self, ids, score, method, limit):
+        return tuple(ProgramMatch(self.programs[i], score, method) for i in ids[:limit])
+
+    def _prefix_ids(self, key):
+        # Whole tokens only: "java" must find "java runtime", never "javascript runtime".
+        ids = []
+        start = bisect_left(self._sorted_keys, key)
+        for candidate in self._sorted_keys[start:]:
+            if not candidate.startswith(key):
+                break
+            if candidate == key or candidate.startswith(key + " "):
+                ids.extend(self._normalized[candidate])
+        return ids
+
+    def _containing_ids(self, key_tokens):
+        postings = [self._tokens.get(token) for token in key_tokens]
+        if not postings or any(p is None for p in postings):
+            return []
+        postings.sort(key=len)
+        common = set(postings[0]).intersection(*postings[1:])
+        return sorted(common)
+
+    def nearest(self, key_tokens, min_similarity=MIN_FUZZY_SIMILARITY):
+        """
+        Return ``(normalized_key, similarity)`` for the closest indexed key by trigram Jaccard.
+        """
+        grams = trigrams(key_tokens)
+        if not grams:
+            return None
+        # Prefix filter: a key at ``min_similarity`` or better shares at least ceil(t * |grams|)
+        # grams, so it must contain one of the rarest |grams| - ceil(t * |grams|) + 1 of them.
+        # Common grams (" ja", "ver") are never scanned.
+        ranked = sorted(grams, key=lambda gram: len(self._trigrams.get(gram, ())))
+        probe = len(grams) - math.ceil(min_similarity * len(grams)) + 1
+        candidates = set()
+        for gram in ranked[:probe]:
+            candidates.update(self._trigrams.get(gram, ()))
+
+        best_key, best_score = None, 0.0
+        for key in candidates:
+            other = self._gram_sets[key]
+            shared = len(grams & other)
+            score = shared / (len(grams) + len(other) - shared)
+            if score > best_score or (score == best_score and best_key is not None and key < best_key):
+                best_key, best_score = key, score
+        if best_key is not None and best_score >= min_similarity:
+            return best_key, best_score
+        return None
+
+    def _lookup(self, name: str, limit: int = 3) -> Tuple[ProgramMatch, ...]:
+        lowered = (name or "").strip().lower()
+        if not lowered:
+            return ()
+        if lowered in self._exact:
+            return self._records(self._exact[lowered], 1.0, "exact", limit)
+
+        tokens = tokenize(lowered)
+        key_tokens = strip_versions(tokens)
+        if not key_tokens:
+            return ()
+        key = " ".join(key_tokens)
+        if key in self._normalized:
+            # Numbers can be part of the product ("Python 3", "SQL Server 2019"), so a record only
+            # counts as the same product when it carries every number the query names.
+            wanted = numbers(tokens)
+            ids = self._normalized[key]
+            agreeing = [i for i in ids if wanted <= self._numbers[i]]
+            others = [i for i in ids if not wanted <= self._numbers[i]]
+            matches = self._records(agreeing, 0.95, "normalized", limit)
+            return matches + self._records(others, 0.8, "other_version", limit - len(matches))
+
+        prefix_ids = self._prefix_ids(key)
+        if prefix_ids:
+            return self._records(prefix_ids, 0.85, "prefix", limit)
+
+        containing = self._containing_ids(key_tokens)
+        if containing:
+            return self._records(containing, 0.8, "tokens", limit)
+
+        nearest = self.nearest(key_tokens)
+        if nearest:
+            nearest_key, score = nearest
+            return self._records(self._normalized[nearest_key], round(score, 3), "fuzzy", limit)
+        return ()
+
+
+_index_cache: "OrderedDict[str, ProgramIndex]" = OrderedDict()
+_index_cache_lock = threading.Lock()
+
+
+def programs_hash(raw_programs) -> str:
+    payload = json.dumps(raw_programs or [], sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+def index_programs(raw_programs, key: Optional[str] = None) -> ProgramIndex:
+    """
+    Return the ProgramIndex for ``raw_programs``, reusing one built earlier for the same input.
+
+    ``key`` identifies the input (e.g. the dump's sha256); it defaults to a hash of the records.
+    """
+    key = key or programs_hash(raw_programs)
+    with _index_cache_lock:
+        index = _index_cache.get(key)
+        if index is not None:
+            _index_cache.move_to_end(key)
+            return index
+    index = ProgramIndex(raw_programs)
+    with _index_cache_lock:
+        _index_cache[key] = index
+        while len(_index_cache) > INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return index
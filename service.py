@@ -0,0 +1,147 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from dataclasses import replace
+
+from aiohttp import web
+from dotenv import load_dotenv
+
+from pipeline import PipelineOptions, run_workload, safe_path_component
+
+load_dotenv()
+
+SPOOL_DIR = os.getenv("AUTOBLUEPRINT_SPOOL_DIR", os.path.join("input", "submissions"))
+
+
+def _ndjson(payload):
+    return (json.dumps(payload, default=str) + "\n").encode("utf-8")
+
+
+async def _spool_upload(request, name):
+    """
+    Write the request body to a spool file so the pipeline can parse it like any other input.
+
+    Returns the spool path and the sha256 of the upload.
+    """
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix=f"{name}_", suffix=".json", dir=SPOOL_DIR)
+    hasher = hashlib.sha256()
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in request.content.iter_chunked(64 * 1024):
+                hasher.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, hasher.hexdigest()
+
+
+def _remove_spool(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def submit_workload(request):
+    """
+    Accept an OSQuery dump and stream progress events as NDJSON, ending with the result.
+    """
+    app_options = request.app["pipeline_options"]
+    # mkstemp does not sanitise its prefix, so "../" in the name would escape SPOOL_DIR.
+    name = safe_path_component(request.query.get("name"), default="discovery")
+    source, sha256 = await _spool_upload(request, name)
+    try:
+        # The spooled copy is deleted below, so the workload records the upload by name and hash.
+        upload = {"path": None, "upload_name": name, "sha256": sha256}
+        return await _stream_run(request, app_options, source, name, upload)
+    finally:
+        _remove_spool(source)
+
+
+async def _stream_run(request, app_options, source, workload_id, upload):
+    response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+    await response.prepare(request)
+
+    events = asyncio.Queue()
+    # Share the app-wide limiter so every submission draws from one LLM pool.
+    options = replace(
+        app_options,
+        classifier_backend=request.query.get("backend") or app_options.classifier_backend,
+        on_progress=events.put_nowait,
+        classify_limiter=app_options.classify_slots(),
+    )
+
+    run = asyncio.create_task(run_workload(source, options, workload_id=workload_id, input_files=[upload]))
+    try:
+        while not run.done():
+            getter = asyncio.create_task(events.get())
+            finished, _ = await asyncio.wait({getter, run}, return_when=asyncio.FIRST_COMPLETED)
+            if getter in finished:
+                await response.write(_ndjson({"event": "progress", **getter.result()}))
+            else:
+                getter.cancel()
+        while not events.empty():
+            await response.write(_ndjson({"event": "progress", **events.get_nowait()}))
+        try:
+            result = run.result()
+        except Exception as exc:
+            result = {
+                "source": source,
+                "status": "failed",
+                "error": {"stage": None, "message": f"{type(exc).__name__}: {exc}"},
+            }
+        await response.write(_ndjson({"event": "result", **result}))
+    except (asyncio.CancelledError, ConnectionResetError):
+        run.cancel()
+        raise
+    await response.write_eof()
+    return response
+
+
+async def health(request):
+    return web.json_response({"status": "ok"})
+
+
+def create_app(options=None):
+    app = web.Application(client_max_size=0)
+    app["pipeline_options"] = options or PipelineOptions()
+    app.router.add_post("/workloads", submit_workload)
+    app.router.add_get("/healthz", health)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the AutoBlueprint pipeline as a local HTTP service")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    parser.add_argument("--output", default="output", help="Root directory for generated artifacts")
+    parser.add_argument(
+        "--classify-concurrency",
+        type=int,
+        default=int(os.getenv("CLASSIFY_CONCURRENCY", "4")),
+        help="Maximum concurrent classification calls across all submissions",
+    )
+    parser.add_argument(
+        "--classifier-backend",
+        default=os.getenv("CLASSIFIER_BACKEND"),
+        help="Classifier backend to use (openai or local)",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    options = PipelineOptions(
+        classifier_backend=args.classifier_backend,
+        output_root=args.output,
+        classify_concurrency=args.classify_concurrency,
+    )
+    web.run_app(create_app(options), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,8 @@ import hashlib
 import os
 from datetime import datetime, timezone
 
+from program_index import RECORD_METHODS, index_programs, program_name
+
 DEFAULT_MIN_COMPONENT_CONFIDENCE = 0.6
 
 
@@ -13,38 +15,25 @@ def _file_sha256(path):
     return hasher.hexdigest()
 
 
-def _normalize_name(component):
-    for key in ("name", "program", "display_name", "product"):
-        value = component.get(key)
-        if value:
-            return value
-    return "unknown"
-
-
-def _index_raw_programs(raw_programs):
-    index = {}
-    for program in raw_programs or []:
-        name = _normalize_name(program).strip().lower()
-        if not name:
-            continue
-        index.setdefault(name, []).append(program)
-    return index
-
-
-def _build_component(component, raw_index, llm_model):
-    name = _normalize_name(component)
-    version = component.get("version") or component.get("product_version")
+def _build_component(component, program_index, llm_model):
+    name = program_name(component)
     comp_type = component.get("type") or component.get("category")
-    raw_matches = raw_index.get(name.strip().lower(), [])
+    raw_matches = program_index.lookup(name)
+    version = component.get("version") or component.get("product_version")
+    # A prefix, token or fuzzy match may be a different product, so its version is not borrowed.
+    if not version and raw_matches and raw_matches[0].method in RECORD_METHODS:
+        version = raw_matches[0].program.get("version")
 
     evidence = []
-    for idx, record in enumerate(raw_matches[:3]):
+    for idx, match in enumerate(raw_matches):
         evidence.append(
             {
                 "type": "osquery_record",
                 "source": "programs",
                 "index": idx,
-                "record": record,
+                "match": match.method,
+                "match_score": match.score,
+                "record": match.program,
             }
         )
     evidence.append(
@@ -56,7 +45,8 @@ def _build_component(component, raw_index, llm_model):
 
     confidence = 0.4
     if raw_matches:
-        confidence += 0.4
+        # Fuzzy matches count for less than exact or version-stripped ones.
+        confidence += 0.4 if raw_matches[0].score >= 0.95 else 0.3
     if version:
         confidence += 0.1
     if comp_type:
@@ -134,13 +124,24 @@ def build_workload(
     llm_model=None,
     schema_version="0",
     parsed=None,
+    workload_id=None,
+    input_files=None,
+    program_index=None,
 ):
-    workload_id = os.path.splitext(os.path.basename(input_path))[0] or "workload"
+    workload_id = workload_id or os.path.splitext(os.path.basename(input_path))[0] or "workload"
+    if input_files is None:
+        input_files = [
+            {
+                "path": input_path,
+                "sha256": _file_sha256(input_path),
+            }
+        ]
     generated_at = datetime.now(timezone.utc).isoformat()
 
-    raw_index = _index_raw_programs(raw_programs)
+    if program_index is None:
+        program_index = index_programs(raw_programs)
     components = [
-        _build_component(component, raw_index, llm_model)
+        _build_component(component, program_index, llm_model)
         for component in (classified_components or [])
     ]
 
@@ -149,12 +150,7 @@ def build_workload(
         "metadata": {
             "workload_id": workload_id,
             "generated_at": generated_at,
-            "input_files": [
-                {
-                    "path": input_path,
-                    "sha256": _file_sha256(input_path),
-                }
-            ],
+            "input_files": input_files,
             "llm": {
                 "provider": llm_provider,
                 "model": llm_model,